@@ -1,10 +1,16 @@
 import os
+import time
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request
 
+import metrics
 from formatters.recipe import RecipeFormatter
 from formatters.todo import TodoFormatter
+from preview_session import PreviewSessionStore
+from print_scheduler import PRIORITIES
+from printer_router import load_config
 from printer_service import PrinterService
+from profiling import profiled, top_functions
 
 app = Flask(__name__)
 
@@ -12,48 +18,95 @@ app = Flask(__name__)
 # In production, user would change this or we'd load from env
 PRINTER_MODE = os.environ.get("PRINTER_MODE", "mock")
 
+MQTT_PRINTERS = []
 if PRINTER_MODE == "mqtt":
-    mqtt_config = {
-        "host": os.environ.get("MQTT_BROKER_HOST", "192.168.50.211"),
-        "port": int(os.environ.get("MQTT_BROKER_PORT", "1883")),
-        "user": os.environ.get("MQTT_BROKER_USER", "printer"),
-        "password": os.environ.get("MQTT_BROKER_PASS", "printer"),
-    }
+    # Brokers and printers come from MQTT_CONFIG_FILE, or from the
+    # MQTT_BROKER_* / MQTT_PRINTERS env vars for a single broker
+    mqtt_config = load_config()
+    MQTT_PRINTERS = [
+        {"id": p["id"], "name": p["name"]} for p in mqtt_config["printers"]
+    ]
     print_service = PrinterService(mode="mqtt", mqtt_config=mqtt_config)
 else:
     print_service = PrinterService(mode=PRINTER_MODE)
 
-# Parse printer list from env: "jesse-printer:Jesse,kitchen-huxley:Kitchen"
-MQTT_PRINTERS_RAW = os.environ.get("MQTT_PRINTERS", "jesse-printer:Jesse,kitchen-huxley:Kitchen")
-MQTT_PRINTERS = []
-if PRINTER_MODE == "mqtt":
-    for entry in MQTT_PRINTERS_RAW.split(","):
-        parts = entry.strip().split(":")
-        if len(parts) == 2:
-            MQTT_PRINTERS.append({"id": parts[0], "name": parts[1]})
-
 recipe_formatter = RecipeFormatter()
 todo_formatter = TodoFormatter()
+preview_sessions = PreviewSessionStore(print_service, recipe_formatter, todo_formatter)
+
+
+@app.before_request
+def start_request_timer():
+    if metrics.ENABLED:
+        g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        metrics.observe(
+            "checkoff_request_duration_seconds",
+            time.perf_counter() - started,
+            endpoint=request.url_rule.rule if request.url_rule else "unmatched",
+            method=request.method,
+            status=response.status_code,
+        )
+    return response
 
 
 @app.after_request
 def add_cors_headers(response):
     if app.debug:
         response.headers["Access-Control-Allow-Origin"] = "*"
-        response.headers["Access-Control-Allow-Headers"] = "Content-Type"
-        response.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
+        response.headers["Access-Control-Allow-Headers"] = "Content-Type, X-Profile"
+        response.headers["Access-Control-Allow-Methods"] = "GET, POST, DELETE, OPTIONS"
     return response
 
 
+def _submitter(data):
+    """Who a job is queued for; the scheduler takes turns between submitters."""
+    return data.get("submitter") or request.remote_addr
+
+
+def _check_printer(printer_id):
+    """Error message if a print request can't be routed, else None."""
+    if print_service.mode != "mqtt":
+        return None
+    if not printer_id:
+        return "No printer selected"
+    if not print_service.mqtt.knows(printer_id):
+        return f"Unknown printer '{printer_id}'"
+    return None
+
+
+def _job_info(job):
+    if job is None:
+        return {}
+    info = {"job": job.id, "queued": True}
+    if not print_service.mqtt.is_online(job.printer):
+        info["warning"] = "Printer is offline; the job will print when it reconnects"
+    return info
+
+
 @app.route("/api/printers")
 def get_printers():
+    printers = MQTT_PRINTERS
+    if print_service.mode == "mqtt":
+        live = print_service.mqtt.status()
+        queues = print_service.scheduler.stats()
+        printers = [
+            {**p, "status": live.get(p["id"]), "queue": queues.get(p["id"])}
+            for p in MQTT_PRINTERS
+        ]
     return jsonify({
-        "printers": MQTT_PRINTERS,
+        "printers": printers,
         "mode": print_service.mode,
     })
 
 
 @app.route("/api/print/recipe", methods=["POST"])
+@profiled
 def print_recipe():
     data = request.json
     mode = data.get("mode", "url")  # 'url' or 'text'
@@ -70,11 +123,14 @@ def print_recipe():
         # Basic text pass-through for now
         parsed_data = recipe_formatter.parse_text(title, text)
 
-    if print_service.mode == "mqtt":
-        printer_id = data.get("printer")
-        if not printer_id:
-            return jsonify({"error": "No printer selected"}), 400
-        print_service.set_target(printer_id)
+    priority = data.get("priority", "normal")
+    if priority not in PRIORITIES:
+        return jsonify({"error": f"Unknown priority '{priority}'"}), 400
+
+    printer_id = data.get("printer")
+    error = _check_printer(printer_id)
+    if error:
+        return jsonify({"error": error}), 400
 
     try:
         if data.get("preview"):
@@ -85,20 +141,32 @@ def print_recipe():
             )
             return jsonify({"status": "success", "preview": preview_text})
 
-        print_service.print_recipe(
-            parsed_data["title"],
-            parsed_data["ingredients"],
-            parsed_data["instructions"],
-            url=data.get("url"),
-        )
+        with print_service.lock:
+            if print_service.mode == "mqtt":
+                print_service.set_target(
+                    printer_id, priority=priority, submitter=_submitter(data)
+                )
+            job = print_service.print_recipe(
+                parsed_data["title"],
+                parsed_data["ingredients"],
+                parsed_data["instructions"],
+                url=data.get("url"),
+            )
+            g.print_log = print_service.last_log_path
         return jsonify(
-            {"status": "success", "message": f"Printed '{parsed_data['title']}'"}
+            {
+                "status": "success",
+                "message": f"Printed '{parsed_data['title']}'",
+                **_job_info(job),
+            }
         )
     except Exception as e:
+        metrics.inc("checkoff_errors_total", stage="print_recipe")
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
 @app.route("/api/print/todo", methods=["POST"])
+@profiled
 def print_todo():
     data = request.json
     title = data.get("title", "To Do")
@@ -109,22 +177,149 @@ def print_todo():
     if not items:
         return jsonify({"error": "No items provided"}), 400
 
-    if print_service.mode == "mqtt":
-        printer_id = data.get("printer")
-        if not printer_id:
-            return jsonify({"error": "No printer selected"}), 400
-        print_service.set_target(printer_id)
+    priority = data.get("priority", "normal")
+    if priority not in PRIORITIES:
+        return jsonify({"error": f"Unknown priority '{priority}'"}), 400
+
+    printer_id = data.get("printer")
+    error = _check_printer(printer_id)
+    if error:
+        return jsonify({"error": error}), 400
 
     try:
         if data.get("preview"):
             preview_text = print_service.get_todo_preview(title, items)
             return jsonify({"status": "success", "preview": preview_text})
 
-        print_service.print_todo(title, items)
-        return jsonify({"status": "success", "message": f"Printed {len(items)} items"})
+        with print_service.lock:
+            if print_service.mode == "mqtt":
+                print_service.set_target(
+                    printer_id, priority=priority, submitter=_submitter(data)
+                )
+            job = print_service.print_todo(title, items)
+            g.print_log = print_service.last_log_path
+        return jsonify(
+            {
+                "status": "success",
+                "message": f"Printed {len(items)} items",
+                **_job_info(job),
+            }
+        )
+    except Exception as e:
+        metrics.inc("checkoff_errors_total", stage="print_todo")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@app.route("/api/preview/sessions", methods=["POST"])
+def create_preview_session():
+    data = request.json or {}
+    try:
+        session = preview_sessions.create(data.get("kind", ""), data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
+        metrics.inc("checkoff_errors_total", stage="preview")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+    return jsonify(
+        {
+            "status": "success",
+            "session": session.id,
+            "version": session.version,
+            "lines": session.lines,
+        }
+    )
+
+
+@app.route("/api/preview/sessions/<session_id>", methods=["POST"])
+def update_preview_session(session_id):
+    data = request.json or {}
+    session = preview_sessions.get(session_id)
+    if session is None:
+        return jsonify({"error": "Unknown or expired preview session"}), 404
+
+    with session.lock:
+        if "version" in data and data["version"] != session.version:
+            return jsonify(
+                {"error": "Preview version mismatch", "version": session.version}
+            ), 409
+        try:
+            hunk = session.update(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            metrics.inc("checkoff_errors_total", stage="preview")
+            return jsonify({"status": "error", "message": str(e)}), 500
+
+        return jsonify(
+            {
+                "status": "success",
+                "version": session.version,
+                "changes": [hunk] if hunk else [],
+            }
+        )
+
+
+@app.route("/api/preview/sessions/<session_id>", methods=["DELETE"])
+def delete_preview_session(session_id):
+    if not preview_sessions.delete(session_id):
+        return jsonify({"error": "Unknown or expired preview session"}), 404
+    return jsonify({"status": "success"})
+
+
+@app.route("/api/queue")
+def queue_status():
+    scheduler = print_service.scheduler
+    return jsonify(
+        {
+            "mode": print_service.mode,
+            "printers": scheduler.stats() if scheduler else {},
+        }
+    )
+
+
+@app.route("/api/brokers")
+def broker_status():
+    router = print_service.mqtt
+    return jsonify(
+        {
+            "mode": print_service.mode,
+            "brokers": router.broker_stats() if router else {},
+        }
+    )
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    if not metrics.ENABLED:
+        return jsonify({"error": "Metrics are disabled"}), 404
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/api/debug/profile/<job>")
+def get_profile(job):
+    sort = request.args.get("sort", "cumulative")
+    if sort not in ("cumulative", "tottime", "calls"):
+        return jsonify({"error": f"Unknown sort '{sort}'"}), 400
+    try:
+        limit = int(request.args.get("limit", 25))
+        profile = top_functions(job, sort=sort, limit=limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if profile is None:
+        return jsonify({"error": f"No profile for '{job}'"}), 404
+    return jsonify(profile)
+
+
+@app.route("/api/ready")
+def ready():
+    # Readiness probe: the app serves previews immediately, but prints wait
+    # for the printer (and broker) connections made in the background.
+    readiness = print_service.readiness()
+    return jsonify({"mode": print_service.mode, **readiness}), (
+        200 if readiness["ready"] else 503
+    )
+
 
 @app.route("/api/status")
 def status():
@@ -132,6 +327,7 @@ def status():
     return jsonify(
         {
             "mode": print_service.mode,
+            "ready": print_service.readiness(),
             "dummy_output": str(print_service.get_dummy_output()),
         }
     )
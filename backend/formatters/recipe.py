@@ -1,27 +1,90 @@
 import json
-
-import requests
-from bs4 import BeautifulSoup
+import threading
+import time
+from collections import OrderedDict, deque
+
+import metrics
+
+# Limits for walking a page's JSON-LD. Real Recipe nodes sit a level or two
+# down (top level, @graph, mainEntity); anything past these is noise.
+MAX_JSONLD_BYTES = 2_000_000
+MAX_JSONLD_DEPTH = 12
+MAX_JSONLD_NODES = 5_000
+
+# Big subtrees of non-recipe nodes that never contain the recipe itself
+SKIP_JSONLD_KEYS = frozenset(
+    {
+        "aggregateRating",
+        "author",
+        "breadcrumb",
+        "comment",
+        "image",
+        "interactionStatistic",
+        "logo",
+        "potentialAction",
+        "publisher",
+        "review",
+        "thumbnail",
+        "video",
+    }
+)
 
 
 class RecipeFormatter:
+    def __init__(self, cache_ttl=300, cache_size=64):
+        # Successful URL parses are cached so repeated previews (and the print
+        # that usually follows them) don't re-fetch the page every click.
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
     def parse_url(self, url):
+        if self.cache_ttl:
+            with self._cache_lock:
+                entry = self._cache.get(url)
+                if entry and entry[0] > time.monotonic():
+                    self._cache.move_to_end(url)
+                    metrics.inc("checkoff_cache_hits_total", cache="recipe_url")
+                    return dict(entry[1])
+            metrics.inc("checkoff_cache_misses_total", cache="recipe_url")
+
+        result = self._fetch_and_parse(url)
+
+        if self.cache_ttl and result["title"] != "Error Parsing URL":
+            with self._cache_lock:
+                self._cache[url] = (time.monotonic() + self.cache_ttl, result)
+                self._cache.move_to_end(url)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return dict(result)
+
+    def _fetch_and_parse(self, url):
         try:
+            # Only URL mode needs these; importing them lazily keeps them off
+            # the app's startup path.
+            import requests
+            from bs4 import BeautifulSoup
+
             headers = {"User-Agent": "Mozilla/5.0"}
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, "html.parser")
+            with metrics.stage("url_fetch", doc_type="recipe"):
+                response = requests.get(url, headers=headers)
+                response.raise_for_status()
+
+            with metrics.stage("jsonld_extract", doc_type="recipe"):
+                soup = BeautifulSoup(response.text, "html.parser")
 
-            # 1. Try JSON-LD (Best for modern recipe sites)
-            scripts = soup.find_all("script", type="application/ld+json")
-            for script in scripts:
+                # 1. Try JSON-LD (Best for modern recipe sites)
+                scripts = soup.find_all("script", type="application/ld+json")
+                recipe_data = self._find_recipe_in_scripts(
+                    script.string for script in scripts
+                )
+
+            if recipe_data:
                 try:
-                    data = json.loads(script.string)
-                    recipe_data = self._find_recipe_data(data)
-                    if recipe_data:
-                        return self._parse_json_ld(recipe_data)
+                    return self._parse_json_ld(recipe_data)
                 except Exception:
-                    continue
+                    pass
 
             # 2. Fallback: Naive meta tag extraction
             title = soup.find("meta", property="og:title")
@@ -36,39 +99,110 @@ class RecipeFormatter:
             }
 
         except Exception as e:
+            metrics.inc("checkoff_errors_total", stage="url_parse")
             return {
                 "title": "Error Parsing URL",
                 "ingredients": [],
                 "instructions": str(e),
             }
 
+    def _find_recipe_in_scripts(self, blocks):
+        """
+        Best Recipe node across a page's ld+json blocks (raw strings).
+        Blocks that can't contain a recipe are skipped before parsing, and we
+        stop at the first complete recipe.
+        """
+        best = None
+        for raw in blocks:
+            if not raw or "Recipe" not in raw or len(raw) > MAX_JSONLD_BYTES:
+                continue
+            try:
+                data = json.loads(raw)
+            except (ValueError, RecursionError):
+                # Malformed or too deeply nested to parse; try the next block
+                continue
+            recipe_data = self._find_recipe_data(data)
+            if recipe_data is None:
+                continue
+            score = self._recipe_score(recipe_data)
+            if best is None or score > self._recipe_score(best):
+                best = recipe_data
+                if score == 3:
+                    break
+        return best
+
     def _find_recipe_data(self, data):
-        if isinstance(data, dict):
-            type_val = data.get("@type", "")
-            # Handle if @type is list ["Recipe", "NewsArticle"] or string "Recipe"
-            if isinstance(type_val, list):
-                if any("Recipe" in t for t in type_val):
-                    return data
-            elif isinstance(type_val, str) and "Recipe" in type_val:
-                return data
-
-            # Recurse into @graph if present
-            if "@graph" in data:
-                return self._find_recipe_data(data["@graph"])
-
-            # Recurse into values just in case
-            for key, value in data.items():
-                res = self._find_recipe_data(value)
-                if res:
-                    return res
-
-        elif isinstance(data, list):
-            for item in data:
-                res = self._find_recipe_data(item)
-                if res:
-                    return res
-
-        return None
+        """
+        Finds the Recipe node in parsed JSON-LD without recursion.
+
+        Top-level nodes and @graph members are checked before anything nested,
+        the walk is capped by depth and node count, and it stops at the first
+        complete recipe. If a page has several Recipe nodes and none is
+        complete, the one with the most content wins.
+        """
+        # Two queues: top-level/@graph nodes first, nested values after
+        primary = deque([(data, 0)])
+        nested = deque()
+        best = None
+        visited = 0
+
+        while (primary or nested) and visited < MAX_JSONLD_NODES:
+            queue = primary if primary else nested
+            node, depth = queue.popleft()
+            visited += 1
+
+            if isinstance(node, list):
+                # List items keep the priority of the list they came from
+                if depth < MAX_JSONLD_DEPTH:
+                    queue.extend(
+                        (item, depth + 1)
+                        for item in node
+                        if isinstance(item, (dict, list))
+                    )
+                continue
+
+            if not isinstance(node, dict):
+                continue
+
+            if self._is_recipe(node):
+                score = self._recipe_score(node)
+                if score == 3:
+                    return node
+                if best is None or score > self._recipe_score(best):
+                    best = node
+                continue
+
+            if depth >= MAX_JSONLD_DEPTH:
+                continue
+
+            graph = node.get("@graph")
+            if isinstance(graph, (dict, list)):
+                primary.append((graph, depth + 1))
+
+            for key, value in node.items():
+                if key == "@graph" or key in SKIP_JSONLD_KEYS:
+                    continue
+                if isinstance(value, (dict, list)):
+                    nested.append((value, depth + 1))
+
+        return best
+
+    @staticmethod
+    def _is_recipe(node):
+        # Handle if @type is list ["Recipe", "NewsArticle"] or string "Recipe"
+        type_val = node.get("@type", "")
+        if isinstance(type_val, list):
+            return any(isinstance(t, str) and "Recipe" in t for t in type_val)
+        return isinstance(type_val, str) and "Recipe" in type_val
+
+    @staticmethod
+    def _recipe_score(node):
+        """How much of a usable recipe a node has: 3 means complete."""
+        return (
+            bool(node.get("recipeIngredient"))
+            + bool(node.get("recipeInstructions"))
+            + bool(node.get("name"))
+        )
 
     def _parse_json_ld(self, data):
         title = data.get("name", "Untitled Recipe")
@@ -1,5 +1,20 @@
 import re
 
+# One alternation per line type, in the same priority order the parser has
+# always used. ``match.lastgroup`` tells us which branch won, so every line is
+# classified with a single regex dispatch.
+_LINE_RE = re.compile(
+    r"(?P<header3>###)"
+    r"|(?P<header2>##)"
+    r"|(?P<header>#)"
+    r"|(?P<checkbox>[-*] \[[ x]\])"
+    r"|(?P<numbered>\d+\.\s+)"
+    r"|(?P<bold>(?=\*\*).*\*\*$|(?=__).*__$)"
+    r"|(?P<bullet>[-*])"
+    r"|(?P<plain>)"
+)
+_BOLD_RE = re.compile(r"\*\*(.+?)\*\*|__(.+?)__")
+
 
 class TodoFormatter:
     def parse(self, raw_text):
@@ -14,36 +29,90 @@ class TodoFormatter:
         """
         items = []
         for line in raw_text.split("\n"):
-            line = line.strip()
-            if not line:
-                continue
-
-            if line.startswith("###"):
-                items.append({"type": "header3", "text": line.lstrip("#").strip()})
-            elif line.startswith("##"):
-                items.append({"type": "header2", "text": line.lstrip("#").strip()})
-            elif line.startswith("#"):
-                items.append({"type": "header", "text": line.lstrip("#").strip()})
-            elif line.startswith("- [ ]") or line.startswith("* [ ]"):
-                items.append({"type": "task", "text": self._strip_bold(line[5:].strip())})
-            elif line.startswith("- [x]") or line.startswith("* [x]"):
-                items.append({"type": "task", "text": self._strip_bold(line[5:].strip())})
-            elif re.match(r"^\d+\.\s", line):
-                text = re.sub(r"^\d+\.\s*", "", line)
-                items.append({"type": "task", "text": self._strip_bold(text)})
-            elif self._is_full_bold(line):
-                text = line.strip("*").strip("_").strip()
-                items.append({"type": "bold", "text": text})
-            elif line.startswith("-") or line.startswith("*"):
-                items.append({"type": "task", "text": self._strip_bold(line[1:].strip())})
-            else:
-                items.append({"type": "plain", "text": self._strip_bold(line)})
-
+            item = self.parse_line(line)
+            if item:
+                items.append(item)
         return items
 
-    def _is_full_bold(self, line):
-        return (line.startswith("**") and line.endswith("**")) or \
-               (line.startswith("__") and line.endswith("__"))
+    def parse_line(self, line):
+        """Classifies a single line. Returns None for blank lines."""
+        line = line.strip()
+        if not line:
+            return None
+
+        match = _LINE_RE.match(line)
+        kind = match.lastgroup
+
+        if kind in ("header3", "header2", "header"):
+            return {"type": kind, "text": line.lstrip("#").strip()}
+        if kind == "checkbox":
+            return {"type": "task", "text": self._strip_bold(line[5:].strip())}
+        if kind == "numbered":
+            return {"type": "task", "text": self._strip_bold(line[match.end() :])}
+        if kind == "bold":
+            return {"type": "bold", "text": line.strip("*").strip("_").strip()}
+        if kind == "bullet":
+            return {"type": "task", "text": self._strip_bold(line[1:].strip())}
+        return {"type": "plain", "text": self._strip_bold(line)}
+
+    def parse_incremental(self, old_lines, old_line_items, new_text):
+        """
+        Re-parses only the lines that changed between two versions of a list.
+
+        ``old_lines`` and ``old_line_items`` are the raw lines and per-line
+        results (``parse_line`` output, None for blanks) from the previous
+        call. Lines shared by the unchanged prefix and suffix keep their
+        cached items. Returns ``(new_lines, new_line_items, changed)`` where
+        ``changed`` is ``(start, old_end, new_end)`` in line indexes.
+        """
+        new_lines = new_text.split("\n")
+
+        start = 0
+        limit = min(len(old_lines), len(new_lines))
+        while start < limit and old_lines[start] == new_lines[start]:
+            start += 1
+
+        old_end, new_end = len(old_lines), len(new_lines)
+        while (
+            old_end > start
+            and new_end > start
+            and old_lines[old_end - 1] == new_lines[new_end - 1]
+        ):
+            old_end -= 1
+            new_end -= 1
+
+        new_line_items = (
+            old_line_items[:start]
+            + [self.parse_line(line) for line in new_lines[start:new_end]]
+            + old_line_items[old_end:]
+        )
+        return new_lines, new_line_items, (start, old_end, new_end)
 
     def _strip_bold(self, text):
-        return re.sub(r"\*\*(.+?)\*\*|__(.+?)__", lambda m: m.group(1) or m.group(2), text)
+        if "**" not in text and "__" not in text:
+            return text
+        return _BOLD_RE.sub(lambda m: m.group(1) or m.group(2), text)
+
+
+class TodoDocument:
+    """A todo list that keeps per-line parse results between edits."""
+
+    def __init__(self, text="", formatter=None):
+        self.formatter = formatter or TodoFormatter()
+        self.lines = text.split("\n")
+        self.line_items = [self.formatter.parse_line(line) for line in self.lines]
+
+    @property
+    def text(self):
+        return "\n".join(self.lines)
+
+    @property
+    def items(self):
+        return [item for item in self.line_items if item]
+
+    def update(self, new_text):
+        """Applies a new version of the text. Returns the changed line range."""
+        self.lines, self.line_items, changed = self.formatter.parse_incremental(
+            self.lines, self.line_items, new_text
+        )
+        return changed
@@ -0,0 +1,198 @@
+"""In-process counters and timing histograms, exported in Prometheus format.
+
+Hot paths wrap their work in ``metrics.timer(...)`` and bump counters with
+``metrics.inc(...)``; ``GET /metrics`` renders everything with ``render()``.
+
+Set ``METRICS_ENABLED=0`` to turn it off: ``timer()`` then hands back a
+shared no-op context manager and ``inc()``/``observe()`` return immediately,
+so instrumented code costs one flag check.
+"""
+
+import os
+import threading
+import time
+
+ENABLED = os.environ.get("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+
+# Seconds; covers sub-millisecond layout up to slow recipe sites
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+
+HELP = {
+    "checkoff_stage_duration_seconds": "Time spent in each processing stage.",
+    "checkoff_request_duration_seconds": "HTTP request handling time.",
+    "checkoff_job_ack_latency_seconds": "Time from MQTT publish to printer ack.",
+    "checkoff_queue_wait_seconds": "Time jobs spent queued before publishing.",
+    "checkoff_jobs_total": "Print jobs rendered.",
+    "checkoff_job_bytes_total": "ESC/POS bytes rendered.",
+    "checkoff_broker_bytes_total": "ESC/POS bytes published, by MQTT broker.",
+    "checkoff_cache_hits_total": "Cache lookups that were served from cache.",
+    "checkoff_cache_misses_total": "Cache lookups that had to do the work.",
+    "checkoff_errors_total": "Errors, by stage.",
+}
+
+
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join(f'{name}="{_escape(value)}"' for name, value in pairs)
+    return "{" + body + "}"
+
+
+class Counter:
+    def __init__(self, name):
+        self.name = name
+        self.values = {}
+
+    def inc(self, key, amount):
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        for key, value in sorted(self.values.items()):
+            yield f"{self.name}{_format_labels(key)} {value}"
+
+
+class Histogram:
+    def __init__(self, name, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.buckets = buckets
+        self.series = {}  # key -> [per-bucket counts..., sum, count]
+
+    def observe(self, key, value):
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+                break
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self):
+        for key, series in sorted(self.series.items()):
+            cumulative = 0
+            for i, bound in enumerate(self.buckets):
+                cumulative += series[i]
+                labels = _format_labels(key, [("le", bound)])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(key, [("le", "+Inf")])
+            yield f"{self.name}_bucket{labels} {series[-1]}"
+            yield f"{self.name}_sum{_format_labels(key)} {series[-2]}"
+            yield f"{self.name}_count{_format_labels(key)} {series[-1]}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, amount, labels):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Counter(name)
+            metric.inc(_key(labels), amount)
+
+    def observe(self, name, value, labels):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Histogram(name)
+            metric.observe(_key(labels), value)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, metric in sorted(self._metrics.items()):
+                kind = "counter" if isinstance(metric, Counter) else "histogram"
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        with self._lock:
+            self._metrics.clear()
+
+
+REGISTRY = Registry()
+
+
+class _Timer:
+    __slots__ = ("name", "labels", "start")
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        REGISTRY.observe(self.name, time.perf_counter() - self.start, self.labels)
+        return False
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name, **labels):
+    """Context manager that records the block's duration in a histogram."""
+    if not ENABLED:
+        return _NULL_TIMER
+    return _Timer(name, labels)
+
+
+def stage(name, **labels):
+    """Shorthand for timing one processing stage (fetch, layout, render...)."""
+    if not ENABLED:
+        return _NULL_TIMER
+    labels["stage"] = name
+    return _Timer("checkoff_stage_duration_seconds", labels)
+
+
+def inc(name, amount=1, **labels):
+    if ENABLED:
+        REGISTRY.inc(name, amount, labels)
+
+
+def observe(name, value, **labels):
+    if ENABLED:
+        REGISTRY.observe(name, value, labels)
+
+
+def render():
+    return REGISTRY.render()
@@ -2,45 +2,154 @@
 
 Publishes raw ESC/POS bytes to an MQTT broker. GL300 routers subscribe
 to the relevant topics and forward payloads to USB-connected printers.
+
+The routers report back on two topics, which we subscribe to:
+
+- ``printer/<id>/status``: retained presence, ``online``/``offline`` or a
+  JSON object such as ``{"state": "online", "paper": "low"}``. The router's
+  last will sets it to ``offline`` when it drops off the broker.
+- ``printer/<id>/acks``: one message per job written to the printer, e.g.
+  ``{"bytes": 1234, "ok": true}``. The agent handles jobs in order, so
+  acks are matched to published jobs first-in, first-out. Jobs that never
+  get an ack would throw that pairing off, so jobs still pending when a
+  printer comes back online, or pending longer than
+  ``PENDING_TIMEOUT_SECONDS``, are counted as lost and dropped.
 """
 
+import json
 import logging
+import threading
+import time
+from collections import deque
 
 import paho.mqtt.client as mqtt
 
+import metrics
+
 log = logging.getLogger(__name__)
 
+STATUS_TOPIC = "printer/+/status"
+ACKS_TOPIC = "printer/+/acks"
+
+# How many recent job latencies to keep per printer
+LATENCY_SAMPLES = 200
+
+# Publish results where paho discarded the message rather than queueing it
+DROPPED_RCS = (mqtt.MQTT_ERR_QUEUE_SIZE, mqtt.MQTT_ERR_PAYLOAD_SIZE)
+
+# Jobs awaiting an ack longer than this, or beyond this many, count as lost
+PENDING_TIMEOUT_SECONDS = 600
+PENDING_LIMIT = 200
+
+
+class PrinterState:
+    """What we last heard from one printer's router."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.online = None  # None until the router reports in
+        self.paper = None
+        self.last_seen = None
+        self.last_error = None
+        self.acked = 0
+        self.failed = 0
+        self.lost = 0
+        self.pending = deque()  # (published_at, size) of jobs awaiting an ack
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def as_dict(self) -> dict:
+        latencies = sorted(self.latencies)
+        avg_ms = p95_ms = None
+        if latencies:
+            avg_ms = round(1000 * sum(latencies) / len(latencies), 1)
+            p95_ms = round(1000 * latencies[int(0.95 * (len(latencies) - 1))], 1)
+        return {
+            "online": self.online,
+            "paper": self.paper,
+            "last_seen": self.last_seen,
+            "last_error": self.last_error,
+            "pending_acks": len(self.pending),
+            "jobs_acked": self.acked,
+            "jobs_failed": self.failed,
+            "jobs_lost": self.lost,
+            "latency_avg_ms": avg_ms,
+            "latency_p95_ms": p95_ms,
+        }
+
 
 class MqttPrinter:
-    """Publishes print jobs over MQTT."""
+    """Publishes print jobs over MQTT and tracks printer status and acks."""
 
     def __init__(self, host: str, port: int, user: str, password: str):
+        self._states = {}
+        self._lock = threading.Lock()
+        self.connected = False
+        self.connects = 0
+        self.disconnects = 0
+
         self._client = mqtt.Client()
         self._client.username_pw_set(user, password)
 
         self._client.on_connect = self._on_connect
         self._client.on_disconnect = self._on_disconnect
+        self._client.on_message = self._on_message
 
+        # Connect from the network thread: a missing broker must not block
+        # startup, and paho keeps retrying until it comes up.
+        self._client.reconnect_delay_set(min_delay=1, max_delay=30)
         try:
-            self._client.connect(host, port)
+            self._client.connect_async(host, port)
         except Exception:
-            log.exception("Failed to connect to MQTT broker at %s:%s", host, port)
+            log.exception("Invalid MQTT broker address %s:%s", host, port)
             raise
 
         self._client.loop_start()
 
     # -- public api ----------------------------------------------------------
 
-    def publish(self, printer_name: str, data: bytes) -> None:
-        """Publish raw ESC/POS bytes to a printer's job topic."""
+    def publish(self, printer_name: str, data: bytes) -> bool:
+        """Publish raw ESC/POS bytes to a printer's job topic.
+        Returns False if the client dropped the message instead of sending
+        or queueing it."""
         topic = f"printer/{printer_name}/jobs"
-        result = self._client.publish(topic, payload=data, qos=1)
+        with self._lock:
+            state = self._state(printer_name)
+            state.pending.append((time.monotonic(), len(data)))
+            self._expire_pending(state)
+
+        with metrics.stage("mqtt_publish", printer=printer_name):
+            result = self._client.publish(topic, payload=data, qos=1)
+        if result.rc in DROPPED_RCS:
+            log.error("Publish to %s failed (rc=%s)", topic, result.rc)
+            metrics.inc("checkoff_errors_total", stage="mqtt_publish")
+            with self._lock:
+                self._state(printer_name).pending.pop()
+            return False
         if result.rc != mqtt.MQTT_ERR_SUCCESS:
-            log.error(
-                "Publish to %s failed (rc=%s)", topic, result.rc
+            # At QoS 1 paho keeps the message (e.g. MQTT_ERR_NO_CONN) and sends
+            # it after reconnecting, so its ack is still coming.
+            log.warning(
+                "Publish to %s queued until reconnect (rc=%s)", topic, result.rc
             )
         else:
             log.debug("Published %d bytes to %s", len(data), topic)
+        return True
+
+    def is_online(self, printer_name: str) -> bool:
+        """False only if the printer has reported itself offline.
+        Printers we haven't heard from yet are assumed reachable."""
+        with self._lock:
+            state = self._states.get(printer_name)
+            return state is None or state.online is not False
+
+    def can_publish(self, printer_name: str) -> bool:
+        """True when we're connected to the broker and the printer isn't offline."""
+        return self.connected and self.is_online(printer_name)
+
+    def status(self) -> dict:
+        """Live state of every printer we've heard from or published to."""
+        with self._lock:
+            return {name: state.as_dict() for name, state in self._states.items()}
 
     def disconnect(self) -> None:
         """Stop the background network loop and disconnect cleanly."""
@@ -48,16 +157,119 @@ class MqttPrinter:
         self._client.disconnect()
         log.info("Disconnected from MQTT broker")
 
+    # -- internals -----------------------------------------------------------
+
+    def _state(self, printer_name: str) -> PrinterState:
+        """Must be called with the lock held."""
+        state = self._states.get(printer_name)
+        if state is None:
+            state = self._states[printer_name] = PrinterState(printer_name)
+        return state
+
+    def _drop_pending(self, state: PrinterState, count: int, reason: str) -> None:
+        """Forget the oldest `count` pending jobs, counting them as lost."""
+        for _ in range(count):
+            state.pending.popleft()
+        state.lost += count
+        log.warning("%d job(s) for %s got no ack (%s)", count, state.name, reason)
+        metrics.inc("checkoff_errors_total", count, stage="lost", printer=state.name)
+
+    def _expire_pending(self, state: PrinterState) -> None:
+        cutoff = time.monotonic() - PENDING_TIMEOUT_SECONDS
+        expired = 0
+        for published_at, _ in state.pending:
+            if published_at >= cutoff:
+                break
+            expired += 1
+        expired = max(expired, len(state.pending) - PENDING_LIMIT)
+        if expired:
+            self._drop_pending(state, expired, "timed out")
+
+    def _handle_status(self, state: PrinterState, payload: str) -> None:
+        was_online = state.online
+        self._update_status(state, payload)
+        if was_online is False and state.online and state.pending:
+            # The agent restarted: whatever it was in the middle of is gone
+            self._drop_pending(state, len(state.pending), "printer restarted")
+
+    def _update_status(self, state: PrinterState, payload: str) -> None:
+        if not payload:
+            # Retained status was cleared; we no longer know either way
+            state.online = None
+            return
+        try:
+            report = json.loads(payload)
+        except ValueError:
+            report = payload
+        if not isinstance(report, dict):
+            report = {"state": str(report)}
+
+        state.online = str(report.get("state", "")).lower() == "online"
+        if "paper" in report:
+            state.paper = report["paper"]
+        if report.get("error"):
+            state.last_error = report["error"]
+
+    def _handle_ack(self, state: PrinterState, payload: str) -> None:
+        try:
+            ack = json.loads(payload)
+        except ValueError:
+            ack = {}
+        if not isinstance(ack, dict):
+            ack = {}
+
+        self._expire_pending(state)
+        if not state.pending:
+            log.warning("Ack from %s with no job pending", state.name)
+            return
+        published_at, size = state.pending.popleft()
+        if "bytes" in ack and ack["bytes"] != size:
+            log.warning(
+                "Ack from %s for %s bytes, expected %s", state.name, ack["bytes"], size
+            )
+
+        if ack.get("ok", True):
+            state.acked += 1
+            latency = time.monotonic() - published_at
+            state.latencies.append(latency)
+            metrics.observe(
+                "checkoff_job_ack_latency_seconds", latency, printer=state.name
+            )
+        else:
+            state.failed += 1
+            state.last_error = ack.get("error", "print failed")
+            metrics.inc("checkoff_errors_total", stage="print", printer=state.name)
+
     # -- callbacks -----------------------------------------------------------
 
-    @staticmethod
-    def _on_connect(client, userdata, flags, rc):
+    def _on_connect(self, client, userdata, flags, rc):
         if rc == 0:
             log.info("Connected to MQTT broker")
+            self.connected = True
+            self.connects += 1
+            # (Re)subscribe on every connect; the broker resends retained status
+            client.subscribe([(STATUS_TOPIC, 1), (ACKS_TOPIC, 1)])
         else:
             log.error("MQTT connection failed (rc=%s)", rc)
 
-    @staticmethod
-    def _on_disconnect(client, userdata, rc):
+    def _on_disconnect(self, client, userdata, rc):
+        if self.connected:
+            self.disconnects += 1
+        self.connected = False
         if rc != 0:
             log.warning("Unexpected MQTT disconnect (rc=%s)", rc)
+
+    def _on_message(self, client, userdata, msg):
+        parts = msg.topic.split("/")
+        if len(parts) != 3 or parts[0] != "printer":
+            return
+        _, printer_name, kind = parts
+        payload = msg.payload.decode("utf-8", errors="replace").strip()
+
+        with self._lock:
+            state = self._state(printer_name)
+            state.last_seen = time.time()
+            if kind == "status":
+                self._handle_status(state, payload)
+            elif kind == "acks":
+                self._handle_ack(state, payload)
@@ -0,0 +1,214 @@
+"""Server-side live preview sessions.
+
+A session holds the form fields, parsed document and rendered preview lines
+for one open form. Each edit re-parses only the changed todo lines, reuses
+laid-out items, and returns just the preview lines that changed, so the
+frontend can refresh the preview on every keystroke.
+"""
+
+import threading
+import time
+import uuid
+
+from formatters.todo import TodoDocument
+
+SESSION_KINDS = ("recipe", "todo")
+FIELDS = {
+    "recipe": ("mode", "url", "title", "text"),
+    "todo": ("title", "items"),
+}
+
+
+def diff_lines(old, new):
+    """
+    Returns the single hunk that turns ``old`` into ``new``, or None.
+
+    Edits almost always happen at one cursor position, so trimming the common
+    prefix and suffix is enough and stays linear in the number of lines.
+    """
+    start = 0
+    limit = min(len(old), len(new))
+    while start < limit and old[start] == new[start]:
+        start += 1
+
+    old_end, new_end = len(old), len(new)
+    while old_end > start and new_end > start and old[old_end - 1] == new[new_end - 1]:
+        old_end -= 1
+        new_end -= 1
+
+    if start == old_end and start == new_end:
+        return None
+    return {"start": start, "delete": old_end - start, "lines": new[start:new_end]}
+
+
+def apply_edits(fields, edits, names):
+    """
+    Returns a copy of the form fields with text splices applied; ``fields``
+    itself is left alone, so a bad edit can't leave it half-updated.
+    Each edit is {"field": name, "start": i, "end": j, "text": s}, with
+    offsets in code points (Python string indices, not UTF-16 units) into
+    the value of that field after the previous edits. ``names`` are the
+    fields edits may touch; anything else raises ValueError.
+    """
+    if not isinstance(edits, list):
+        raise ValueError("Edits must be a list")
+    fields = dict(fields)
+    for edit in edits:
+        if not isinstance(edit, dict) or edit.get("field") not in names:
+            raise ValueError(f"Edit must name one of the fields {', '.join(names)}")
+        name = edit["field"]
+        text = edit.get("text", "")
+        if not isinstance(text, str):
+            raise ValueError(f"Edit text for '{name}' must be a string")
+        value = fields.get(name) or ""
+        try:
+            start = int(edit.get("start", 0))
+            end = int(edit.get("end", start))
+        except (TypeError, ValueError):
+            raise ValueError(f"Edit range for '{name}' must be integers") from None
+        if not 0 <= start <= end <= len(value):
+            raise ValueError(f"Edit range {start}:{end} out of bounds for '{name}'")
+        fields[name] = value[:start] + text + value[end:]
+    return fields
+
+
+class PreviewSession:
+    def __init__(
+        self, session_id, kind, print_service, recipe_formatter, todo_formatter
+    ):
+        self.id = session_id
+        self.kind = kind
+        self.version = 0
+        self.fields = {}
+        self.lines = []
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+        self._print_service = print_service
+        self._recipe_formatter = recipe_formatter
+        self._todo_formatter = todo_formatter
+        self._todo_doc = None
+        self._item_cache = {}
+        self._parsed_url = None
+        self._parsed_recipe = None
+
+    def update(self, data):
+        """Applies new field values and/or edits, then re-renders the preview.
+        Returns the hunk of changed preview lines, or None if nothing changed.
+        If anything fails, the session is left as it was."""
+        names = FIELDS[self.kind]
+        fields = dict(self.fields)
+        for name in names:
+            if name in data:
+                if not isinstance(data[name], str):
+                    raise ValueError(f"Field '{name}' must be a string")
+                fields[name] = data[name]
+        fields = apply_edits(fields, data.get("edits", []), names)
+
+        old_fields, self.fields = self.fields, fields
+        try:
+            if self.kind == "todo":
+                new_lines = self._render_todo()
+            else:
+                new_lines = self._render_recipe()
+        except Exception:
+            self.fields = old_fields
+            raise
+
+        hunk = diff_lines(self.lines, new_lines)
+        self.lines = new_lines
+        self.version += 1
+        self.last_used = time.monotonic()
+        return hunk
+
+    def _render_todo(self):
+        items_text = self.fields.get("items") or ""
+        if self._todo_doc is None:
+            self._todo_doc = TodoDocument(items_text, formatter=self._todo_formatter)
+        else:
+            self._todo_doc.update(items_text)
+
+        items = self._todo_doc.items
+        # Drop laid-out items that are no longer in the list so the cache
+        # can't grow without bound over a long editing session.
+        if len(self._item_cache) > 2 * len(items) + 64:
+            self._item_cache.clear()
+
+        preview = self._print_service.get_todo_preview(
+            self.fields.get("title") or "To Do", items, item_cache=self._item_cache
+        )
+        return preview.split("\n")
+
+    def _render_recipe(self):
+        if self.fields.get("mode", "url") == "url":
+            url = self.fields.get("url")
+            if not url:
+                return []
+            if url != self._parsed_url:
+                self._parsed_recipe = self._recipe_formatter.parse_url(url)
+                self._parsed_url = url
+            parsed = self._parsed_recipe
+        else:
+            parsed = self._recipe_formatter.parse_text(
+                self.fields.get("title") or "My Recipe", self.fields.get("text") or ""
+            )
+
+        preview = self._print_service.get_recipe_preview(
+            parsed["title"], parsed["ingredients"], parsed["instructions"]
+        )
+        return preview.split("\n")
+
+
+class PreviewSessionStore:
+    """Keeps live preview sessions in memory, expiring idle ones."""
+
+    def __init__(
+        self, print_service, recipe_formatter, todo_formatter, ttl=900, max_sessions=256
+    ):
+        self.print_service = print_service
+        self.recipe_formatter = recipe_formatter
+        self.todo_formatter = todo_formatter
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def create(self, kind, data=None):
+        """A new session, rendered from ``data`` first if given. The session
+        is only stored once that succeeds, so a bad first request doesn't
+        leave an unusable session behind."""
+        if kind not in SESSION_KINDS:
+            raise ValueError(f"Unknown preview kind '{kind}'")
+
+        session = PreviewSession(
+            uuid.uuid4().hex,
+            kind,
+            self.print_service,
+            self.recipe_formatter,
+            self.todo_formatter,
+        )
+        if data is not None:
+            session.update(data)
+        with self._lock:
+            self._expire()
+            if len(self._sessions) >= self.max_sessions:
+                oldest = min(self._sessions.values(), key=lambda s: s.last_used)
+                del self._sessions[oldest.id]
+            self._sessions[session.id] = session
+        return session
+
+    def get(self, session_id):
+        with self._lock:
+            self._expire()
+            return self._sessions.get(session_id)
+
+    def delete(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        for session_id in [
+            s.id for s in self._sessions.values() if s.last_used < cutoff
+        ]:
+            del self._sessions[session_id]
@@ -0,0 +1,238 @@
+"""Per-printer job scheduling between PrinterService and MqttPrinter.
+
+Rendered jobs are queued per printer instead of being published the moment
+they are ready. A worker thread per printer drains its queue:
+
+- urgent jobs go before normal ones, normal before low;
+- within a priority, submitters take turns, one job each. Every job ends
+  with a cut, so this interleaves different people's tickets at cut
+  boundaries and one long list can't starve a short one;
+- publishing is paced to ``bytes_per_sec`` so the router and printer get
+  roughly what they can print instead of a burst to buffer;
+- jobs for a printer that reports itself offline are held in its queue
+  until it comes back, rather than published into the void.
+"""
+
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+PRIORITIES = {"urgent": 0, "normal": 1, "low": 2}
+
+# How many recent wait times to keep per printer for the queue stats
+WAIT_SAMPLES = 200
+
+# How often a held queue re-checks whether its printer is back online
+AVAILABILITY_POLL_SECONDS = 1.0
+
+
+class PrintJob:
+    """One rendered print job waiting for (or sent to) a printer."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, printer, data, priority="normal", submitter=None):
+        self.id = next(self._ids)
+        self.printer = printer
+        self.data = data
+        self.priority = priority
+        self.submitter = submitter or "anonymous"
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+
+    @property
+    def wait_time(self):
+        if self.started_at is None:
+            return time.monotonic() - self.submitted_at
+        return self.started_at - self.submitted_at
+
+
+class _PrinterQueue:
+    """Jobs for one printer: by priority, then round-robin across submitters."""
+
+    def __init__(self):
+        # priority rank -> {submitter: deque of jobs}, in turn order
+        self.levels = {rank: OrderedDict() for rank in PRIORITIES.values()}
+        self.depth = 0
+
+    def push(self, job):
+        submitters = self.levels[PRIORITIES[job.priority]]
+        submitters.setdefault(job.submitter, deque()).append(job)
+        self.depth += 1
+
+    def pop(self):
+        for rank in sorted(self.levels):
+            submitters = self.levels[rank]
+            if not submitters:
+                continue
+            submitter, jobs = next(iter(submitters.items()))
+            job = jobs.popleft()
+            # Move this submitter to the back of the line (or drop it if done)
+            del submitters[submitter]
+            if jobs:
+                submitters[submitter] = jobs
+            self.depth -= 1
+            return job
+        return None
+
+    def depth_by_priority(self):
+        return {
+            name: sum(len(jobs) for jobs in self.levels[rank].values())
+            for name, rank in PRIORITIES.items()
+        }
+
+
+class PrintScheduler:
+    """Queues jobs per printer and publishes them with pacing and fairness."""
+
+    def __init__(self, publish, bytes_per_sec=0, printer_rates=None, is_available=None):
+        """
+        publish: callable(printer_name, data) that actually sends the job;
+            returning False (or raising) marks the job as failed.
+        bytes_per_sec: default pacing rate; 0 disables pacing.
+        printer_rates: optional {printer_name: bytes_per_sec} overrides.
+        is_available: optional callable(printer_name) -> bool; queues for
+            printers it rejects are held until it accepts them again.
+        """
+        self._publish = publish
+        self._is_available = is_available or (lambda printer: True)
+        self.bytes_per_sec = bytes_per_sec
+        self.printer_rates = printer_rates or {}
+
+        self._cond = threading.Condition()
+        self._queues = {}
+        self._workers = {}
+        self._stats = {}
+        self._running = True
+
+    # -- public api ----------------------------------------------------------
+
+    def submit(self, printer, data, priority="normal", submitter=None):
+        """Queue a rendered job for a printer. Returns the PrintJob."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}'")
+
+        job = PrintJob(printer, data, priority=priority, submitter=submitter)
+        with self._cond:
+            if not self._running:
+                raise RuntimeError("Print scheduler has been shut down")
+            self._queue_for(printer).push(job)
+            self._cond.notify_all()
+        log.debug(
+            "Queued job %s (%d bytes, %s) for %s", job.id, len(data), priority, printer
+        )
+        return job
+
+    def stats(self):
+        """Queue depth, throughput and wait-time figures per printer."""
+        with self._cond:
+            out = {}
+            for printer, queue in self._queues.items():
+                stats = self._stats[printer]
+                waits = stats["waits"]
+                out[printer] = {
+                    "queue_depth": queue.depth,
+                    "queued_by_priority": queue.depth_by_priority(),
+                    "jobs_sent": stats["jobs_sent"],
+                    "bytes_sent": stats["bytes_sent"],
+                    "errors": stats["errors"],
+                    "wait_avg_ms": round(1000 * sum(waits) / len(waits), 1)
+                    if waits
+                    else 0.0,
+                    "wait_max_ms": round(1000 * max(waits), 1) if waits else 0.0,
+                    "bytes_per_sec": self._rate_for(printer),
+                    "held": bool(queue.depth) and not self._is_available(printer),
+                }
+            return out
+
+    def shutdown(self, timeout=None):
+        """Stop the worker threads. Jobs still queued are dropped."""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for worker in list(self._workers.values()):
+            worker.join(timeout)
+
+    # -- internals -----------------------------------------------------------
+
+    def _rate_for(self, printer):
+        return self.printer_rates.get(printer, self.bytes_per_sec)
+
+    def _queue_for(self, printer):
+        """Returns the queue for a printer, starting its worker on first use.
+        Must be called with the condition held."""
+        queue = self._queues.get(printer)
+        if queue is None:
+            queue = self._queues[printer] = _PrinterQueue()
+            self._stats[printer] = {
+                "jobs_sent": 0,
+                "bytes_sent": 0,
+                "errors": 0,
+                "waits": deque(maxlen=WAIT_SAMPLES),
+            }
+            worker = threading.Thread(
+                target=self._run, args=(printer,), name=f"print-{printer}", daemon=True
+            )
+            self._workers[printer] = worker
+            worker.start()
+        return queue
+
+    def _run(self, printer):
+        queue = self._queues[printer]
+        stats = self._stats[printer]
+        ready_at = 0.0
+
+        while True:
+            with self._cond:
+                while self._running and not queue.depth:
+                    self._cond.wait()
+                if not self._running:
+                    return
+
+            if not self._is_available(printer):
+                with self._cond:
+                    self._cond.wait(AVAILABILITY_POLL_SECONDS)
+                continue
+
+            # Wait for the printer to get through the previous job before
+            # taking the next one, so a later urgent job can still jump ahead.
+            delay = ready_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            with self._cond:
+                job = queue.pop()
+                if job is None:
+                    continue
+                job.started_at = time.monotonic()
+                stats["waits"].append(job.wait_time)
+            metrics.observe(
+                "checkoff_queue_wait_seconds", job.wait_time, printer=printer
+            )
+
+            try:
+                ok = self._publish(printer, job.data) is not False
+            except Exception:
+                log.exception("Failed to publish job %s to %s", job.id, printer)
+                ok = False
+            if not ok:
+                # Publishers signal a dropped message by returning False
+                log.error("Job %s for %s was not published", job.id, printer)
+                with self._cond:
+                    stats["errors"] += 1
+                metrics.inc("checkoff_errors_total", stage="publish", printer=printer)
+                continue
+
+            with self._cond:
+                stats["jobs_sent"] += 1
+                stats["bytes_sent"] += len(job.data)
+
+            rate = self._rate_for(printer)
+            if rate:
+                ready_at = time.monotonic() + len(job.data) / rate
@@ -0,0 +1,278 @@
+"""Routes print jobs to the MQTT broker each printer is attached to.
+
+Each kitchen runs its own broker with its own routers and printers. The
+routing config maps printer ids to brokers and is read from the JSON file
+named by ``MQTT_CONFIG_FILE``::
+
+    {
+      "brokers": {
+        "huxley": {"host": "10.0.1.2", "port": 1883,
+                   "user": "printer", "password": "printer"},
+        "downtown": {"host": "10.0.2.2"}
+      },
+      "printers": [
+        {"id": "kitchen-huxley", "name": "Kitchen", "broker": "huxley"},
+        {"id": "pass-downtown", "name": "Pass", "broker": "downtown",
+         "bytes_per_sec": 8192}
+      ],
+      "default_broker": "huxley"
+    }
+
+Without a file, the single broker from ``MQTT_BROKER_*`` and the
+``MQTT_PRINTERS`` list are used, as before. Printers that aren't listed are
+only accepted when the file names a ``default_broker``.
+
+``PrinterRouter`` keeps one long-lived ``MqttPrinter`` (paho client and
+network thread) per broker and offers the same interface, so the scheduler
+and app don't care how many brokers there are. The scheduler's per-printer
+workers call ``publish()`` without any router-wide lock, so jobs for
+different brokers go out concurrently.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PORT = 1883
+
+# Window for the per-broker jobs-per-minute figure
+THROUGHPUT_WINDOW_SECONDS = 60
+
+
+def _broker_from_env():
+    return {
+        "host": os.environ.get("MQTT_BROKER_HOST", "192.168.50.211"),
+        "port": int(os.environ.get("MQTT_BROKER_PORT", str(DEFAULT_PORT))),
+        "user": os.environ.get("MQTT_BROKER_USER", "printer"),
+        "password": os.environ.get("MQTT_BROKER_PASS", "printer"),
+    }
+
+
+def _printers_from_env(broker):
+    # "jesse-printer:Jesse,kitchen-huxley:Kitchen"
+    raw = os.environ.get("MQTT_PRINTERS", "jesse-printer:Jesse,kitchen-huxley:Kitchen")
+    printers = []
+    for entry in raw.split(","):
+        parts = entry.strip().split(":")
+        if len(parts) == 2:
+            printers.append({"id": parts[0], "name": parts[1], "broker": broker})
+    return printers
+
+
+def normalize_config(config):
+    """Fills in defaults and checks that every printer names a known broker.
+
+    Also accepts the old single-broker form ({"host", "port", "user",
+    "password"}), which becomes a broker named "default" that every
+    printer routes to."""
+    if "brokers" not in config:
+        return {
+            "brokers": {"default": dict(config)},
+            "printers": [],
+            "default_broker": "default",
+        }
+
+    brokers = {}
+    for name, broker in config["brokers"].items():
+        if not broker.get("host"):
+            raise ValueError(f"Broker '{name}' has no host")
+        brokers[name] = {
+            "host": broker["host"],
+            "port": int(broker.get("port", DEFAULT_PORT)),
+            "user": broker.get("user"),
+            "password": broker.get("password"),
+        }
+    if not brokers:
+        raise ValueError("No MQTT brokers configured")
+
+    default = config.get("default_broker")
+    if default is not None and default not in brokers:
+        raise ValueError(f"Unknown default broker '{default}'")
+
+    printers = []
+    seen = set()
+    for printer in config.get("printers", []):
+        printer_id = printer["id"]
+        broker = printer.get("broker", default)
+        if broker not in brokers:
+            raise ValueError(f"Printer '{printer_id}' uses unknown broker '{broker}'")
+        if printer_id in seen:
+            raise ValueError(f"Printer '{printer_id}' is listed twice")
+        seen.add(printer_id)
+        printers.append(
+            {**printer, "name": printer.get("name", printer_id), "broker": broker}
+        )
+
+    return {"brokers": brokers, "printers": printers, "default_broker": default}
+
+
+def load_config(path=None):
+    """Broker and printer routing config, from a JSON file or the environment."""
+    path = path or os.environ.get("MQTT_CONFIG_FILE")
+    if not path:
+        return {
+            "brokers": {"default": _broker_from_env()},
+            "printers": _printers_from_env("default"),
+            # Only the listed printers; a print for any other id is refused
+            "default_broker": None,
+        }
+
+    with open(path) as f:
+        config = normalize_config(json.load(f))
+    log.info(
+        "Loaded %d printers on %d brokers from %s",
+        len(config["printers"]),
+        len(config["brokers"]),
+        path,
+    )
+    return config
+
+
+class PrinterRouter:
+    """One MqttPrinter per broker, with jobs routed by printer id."""
+
+    def __init__(self, config, client_factory=None):
+        """
+        config: routing config as returned by load_config() (or the old
+            single-broker dict).
+        client_factory: callable(host, port, user, password) returning an
+            MqttPrinter-like client; defaults to MqttPrinter.
+        """
+        if client_factory is None:
+            from mqtt_printer import MqttPrinter
+
+            client_factory = MqttPrinter
+
+        config = normalize_config(config)
+        self.printers = config["printers"]
+        self.default_broker = config["default_broker"]
+        self._routes = {p["id"]: p["broker"] for p in self.printers}
+
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._stats = {}
+        for name, broker in config["brokers"].items():
+            log.info("Connecting to MQTT broker '%s' at %s", name, broker["host"])
+            self._clients[name] = client_factory(
+                host=broker["host"],
+                port=broker["port"],
+                user=broker["user"],
+                password=broker["password"],
+            )
+            self._stats[name] = {
+                "host": f"{broker['host']}:{broker['port']}",
+                "jobs_published": 0,
+                "bytes_published": 0,
+                "errors": 0,
+                "publish_seconds": 0.0,
+                "recent": deque(),  # publish times within the window
+            }
+
+    # -- routing -------------------------------------------------------------
+
+    def broker_for(self, printer_name):
+        """Name of the broker a printer's jobs go to."""
+        broker = self._routes.get(printer_name, self.default_broker)
+        if broker is None:
+            raise ValueError(f"Unknown printer '{printer_name}'")
+        return broker
+
+    def knows(self, printer_name):
+        return printer_name in self._routes or self.default_broker is not None
+
+    def printer_rates(self):
+        """{printer_id: bytes_per_sec} for printers with their own pacing."""
+        return {
+            p["id"]: int(p["bytes_per_sec"])
+            for p in self.printers
+            if "bytes_per_sec" in p
+        }
+
+    # -- MqttPrinter interface -----------------------------------------------
+
+    @property
+    def connected(self):
+        """True while at least one broker is connected; see broker_stats()
+        for each one."""
+        return any(client.connected for client in self._clients.values())
+
+    def publish(self, printer_name, data):
+        broker = self.broker_for(printer_name)
+        client = self._clients[broker]
+
+        start = time.monotonic()
+        ok = client.publish(printer_name, data)
+        elapsed = time.monotonic() - start
+
+        with self._lock:
+            stats = self._stats[broker]
+            stats["publish_seconds"] += elapsed
+            if ok is False:
+                stats["errors"] += 1
+            else:
+                stats["jobs_published"] += 1
+                stats["bytes_published"] += len(data)
+                stats["recent"].append(start)
+        if ok is not False:
+            metrics.inc("checkoff_broker_bytes_total", len(data), broker=broker)
+        return ok
+
+    def is_online(self, printer_name):
+        return self._clients[self.broker_for(printer_name)].is_online(printer_name)
+
+    def can_publish(self, printer_name):
+        return self._clients[self.broker_for(printer_name)].can_publish(printer_name)
+
+    def status(self):
+        """Live printer state from every broker, keyed by printer id."""
+        out = {}
+        for broker, client in self._clients.items():
+            for printer_name, state in client.status().items():
+                out[printer_name] = {**state, "broker": broker}
+        return out
+
+    def disconnect(self):
+        for client in self._clients.values():
+            client.disconnect()
+
+    # -- stats ---------------------------------------------------------------
+
+    def broker_stats(self):
+        """Connection health and throughput per broker."""
+        now = time.monotonic()
+        printers_by_broker = {}
+        for printer in self.printers:
+            printers_by_broker.setdefault(printer["broker"], []).append(printer["id"])
+
+        out = {}
+        with self._lock:
+            for broker, client in self._clients.items():
+                stats = self._stats[broker]
+                recent = stats["recent"]
+                while recent and now - recent[0] > THROUGHPUT_WINDOW_SECONDS:
+                    recent.popleft()
+                attempts = stats["jobs_published"] + stats["errors"]
+                out[broker] = {
+                    "host": stats["host"],
+                    "connected": client.connected,
+                    "connects": client.connects,
+                    "disconnects": client.disconnects,
+                    "printers": printers_by_broker.get(broker, []),
+                    "jobs_published": stats["jobs_published"],
+                    "bytes_published": stats["bytes_published"],
+                    "errors": stats["errors"],
+                    "jobs_last_minute": len(recent),
+                    "publish_avg_ms": round(
+                        1000 * stats["publish_seconds"] / attempts, 3
+                    )
+                    if attempts
+                    else 0.0,
+                }
+        return out
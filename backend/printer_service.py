@@ -1,19 +1,48 @@
 import os
 import re
 import textwrap
+import threading
 import time
 from typing import Any
 
-from escpos.printer import Dummy, Usb
+import metrics
+
+# How long a print call waits for a background connection before giving up
+READY_TIMEOUT = float(os.environ.get("PRINTER_READY_TIMEOUT", "30"))
+
+
+def _dummy():
+    # python-escpos takes a few hundred ms to import (it loads its printer
+    # capabilities database), so it's only pulled in once we render ESC/POS.
+    from escpos.printer import Dummy
+
+    return Dummy()
 
 
 class PrinterService:
-    def __init__(self, mode="mock", usb_args=None, mqtt_config=None):
+    def __init__(self, mode="mock", usb_args=None, mqtt_config=None, background=True):
+        """
+        The MQTT client connects asynchronously and the ESC/POS printer
+        (escpos import, USB handshake) is set up on a background thread, so
+        the app can serve previews right away. Print calls wait for it; see
+        readiness(). Pass background=False to connect synchronously.
+        """
         print(f"Initializing PrinterService in {mode.upper()} mode")
         self.mode = mode
         self.printer: Any = None
         self.mqtt_config = mqtt_config
         self.target_printer = None
+        self.job_priority = "normal"
+        self.job_submitter = None
+        self.scheduler = None
+        self.mqtt = None
+        self.last_log_path = None
+        self.connect_error = None
+        self._ready = threading.Event()
+
+        # Rendering goes through the shared self.printer, so callers hold this
+        # lock around set_target() and the print call for one job.
+        self.lock = threading.RLock()
 
         # Epson TM-H6000IV Vendor/Product IDs (Standard Epson IDs, user might need to adjust)
         # Default is usually Vendor: 0x04b8 (Seiko Epson)
@@ -24,41 +53,98 @@ class PrinterService:
             "out_ep": int(os.environ.get("PRINTER_OUT_EP", "0x01"), 16),
         }
 
-        self._connect()
+        if self.mode == "mqtt":
+            self._start_mqtt()
 
-    def set_target(self, printer_name: str):
+        if background:
+            threading.Thread(
+                target=self._connect, name="printer-connect", daemon=True
+            ).start()
+        else:
+            self._connect()
+
+    def set_target(self, printer_name: str, priority="normal", submitter=None):
         self.target_printer = printer_name
+        self.job_priority = priority
+        self.job_submitter = submitter
+
+    def _start_mqtt(self):
+        # One client per broker; see printer_router for the config format
+        from printer_router import PrinterRouter
+
+        self.mqtt = PrinterRouter(self.mqtt_config)
+        from print_scheduler import PrintScheduler
+
+        self.scheduler = PrintScheduler(
+            self.mqtt.publish,
+            bytes_per_sec=int(os.environ.get("PRINTER_BYTES_PER_SEC", "4096")),
+            printer_rates=self.mqtt.printer_rates(),
+            is_available=self.mqtt.can_publish,
+        )
 
     def _connect(self):
-        if self.mode == "usb":
-            try:
-                self.printer = Usb(
-                    self.usb_args["idVendor"],
-                    self.usb_args["idProduct"],
-                    0,
-                    self.usb_args["in_ep"],
-                    self.usb_args["out_ep"],
-                )
-            except Exception as e:
-                print(f"Failed to connect to USB Printer: {e}. Falling back to Dummy.")
-                self.printer = Dummy()
-        elif self.mode == "mqtt":
-            from mqtt_printer import MqttPrinter
-            self.mqtt = MqttPrinter(
-                host=self.mqtt_config["host"],
-                port=self.mqtt_config["port"],
-                user=self.mqtt_config["user"],
-                password=self.mqtt_config["password"],
+        try:
+            if self.mode == "usb":
+                try:
+                    from escpos.printer import Usb
+
+                    self.printer = Usb(
+                        self.usb_args["idVendor"],
+                        self.usb_args["idProduct"],
+                        0,
+                        self.usb_args["in_ep"],
+                        self.usb_args["out_ep"],
+                    )
+                except Exception as e:
+                    print(
+                        f"Failed to connect to USB Printer: {e}. Falling back to Dummy."
+                    )
+                    self.connect_error = str(e)
+                    self.printer = _dummy()
+            else:
+                self.printer = _dummy()
+        except Exception as e:
+            print(f"Failed to initialize printer: {e}")
+            self.connect_error = str(e)
+        finally:
+            self._ready.set()
+
+    def wait_ready(self, timeout=None):
+        """Blocks until the printer is set up. Returns False on timeout."""
+        return self._ready.wait(timeout)
+
+    def readiness(self):
+        """Whether the printer (and broker, in mqtt mode) are ready to print."""
+        printer_ready = self._ready.is_set() and self.printer is not None
+        broker_connected = self.mqtt.connected if self.mqtt else None
+        return {
+            "ready": printer_ready and broker_connected is not False,
+            "printer": printer_ready,
+            "broker": broker_connected,
+            "error": self.connect_error,
+        }
+
+    def _ensure_printer(self):
+        if not self.wait_ready(READY_TIMEOUT) or self.printer is None:
+            raise RuntimeError(
+                f"Printer is not ready: {self.connect_error or 'still connecting'}"
             )
-            self.printer = Dummy()
-        else:
-            self.printer = Dummy()
 
     def _flush_to_mqtt(self):
+        """Queues the rendered job for the target printer. Returns the PrintJob."""
         if self.mode == "mqtt" and self.target_printer:
             data = self.printer.output
-            self.mqtt.publish(self.target_printer, data)
-            self.printer = Dummy()  # reset for next job
+            self.printer = _dummy()  # reset for next job
+            metrics.inc(
+                "checkoff_job_bytes_total", len(data), printer=self.target_printer
+            )
+            return self.scheduler.submit(
+                self.target_printer,
+                data,
+                priority=self.job_priority,
+                submitter=self.job_submitter,
+            )
+        return None
 
     def _save_to_log(self, title, content, url=None):
         """Saves the printed content to a log file."""
@@ -72,12 +158,14 @@ class PrinterService:
         epoch = int(time.time())
         filename = f"logs/{slug}-{epoch}.txt"
 
-        with open(filename, "w") as f:
+        with metrics.stage("log_write"), open(filename, "w") as f:
             if url:
                 f.write(f"URL: {url}\n\n")
             f.write(content)
 
         print(f"Logged print to {filename}")
+        self.last_log_path = filename
+        return filename
 
     def _normalize_fractions(self, text):
         """Replaces Unicode fraction characters with their ASCII counterparts."""
@@ -130,10 +218,14 @@ class PrinterService:
 
     def print_text(self, text):
         """Prints simple text with automatic encoding handling"""
+        self._ensure_printer()
         self.printer.text(text)
         if hasattr(self.printer, "cut"):
             self.printer.cut()
-        self._flush_to_mqtt()
+        metrics.inc(
+            "checkoff_jobs_total", doc_type="text", printer=self._printer_label()
+        )
+        return self._flush_to_mqtt()
 
     def _generate_recipe_text(self, title, ingredients, instructions):
         """Generates the text content for a recipe"""
@@ -152,14 +244,29 @@ class PrinterService:
         return "\n".join(out)
 
     def get_recipe_preview(self, title, ingredients, instructions):
-        return self._generate_recipe_text(title, ingredients, instructions)
+        with metrics.stage("layout", doc_type="recipe"):
+            return self._generate_recipe_text(title, ingredients, instructions)
+
+    def _printer_label(self):
+        """Printer name for metrics labels"""
+        return self.target_printer if self.mode == "mqtt" else self.mode
 
     def print_recipe(self, title, ingredients, instructions, url=None):
         """Formats and prints a recipe"""
+        self._ensure_printer()
         # Log the print
-        log_content = self._generate_recipe_text(title, ingredients, instructions)
+        with metrics.stage("layout", doc_type="recipe"):
+            log_content = self._generate_recipe_text(title, ingredients, instructions)
         self._save_to_log(title, log_content, url=url)
 
+        printer = self._printer_label()
+        with metrics.stage("render", doc_type="recipe", printer=printer):
+            self._render_recipe(title, ingredients, instructions)
+        metrics.inc("checkoff_jobs_total", doc_type="recipe", printer=printer)
+        return self._flush_to_mqtt()
+
+    def _render_recipe(self, title, ingredients, instructions):
+        """Renders a recipe as ESC/POS commands on self.printer"""
         if hasattr(self.printer, "hw"):
             self.printer.hw("init")
 
@@ -209,40 +316,71 @@ class PrinterService:
 
         if hasattr(self.printer, "cut"):
             self.printer.cut()
-        self._flush_to_mqtt()
 
-    def _generate_todo_text(self, title, items):
+    def _generate_todo_item_text(self, item):
+        """Generates the preview text for a single todo item"""
+        text = item["text"]
+        itype = item["type"]
+        if itype == "header":
+            return f"\n{self._normalize_fractions(text).upper()}\n" + "-" * len(text)
+        elif itype == "header2":
+            return f"\n{self._normalize_fractions(text).upper()}"
+        elif itype == "header3":
+            return f"\n{self._normalize_fractions(text)}"
+        elif itype == "task":
+            return self._wrap_text(f"[ ] {text}")
+        elif itype == "bold":
+            return self._wrap_text(text).upper()
+        else:
+            return self._wrap_text(text)
+
+    def _generate_todo_text(self, title, items, item_cache=None):
+        """
+        Generates the text content for a todo list.
+        If item_cache (a dict) is given, rendered items are looked up by
+        (type, text) so repeated previews only lay out new or edited items.
+        """
         out = []
         out.append(self._wrap_text(title))
         out.append("-" * 42)
+        misses = 0
         for item in items:
-            text = item["text"]
-            itype = item["type"]
-            if itype == "header":
-                out.append(f"\n{self._normalize_fractions(text).upper()}")
-                out.append("-" * len(text))
-            elif itype == "header2":
-                out.append(f"\n{self._normalize_fractions(text).upper()}")
-            elif itype == "header3":
-                out.append(f"\n{self._normalize_fractions(text)}")
-            elif itype == "task":
-                out.append(self._wrap_text(f"[ ] {text}"))
-            elif itype == "bold":
-                out.append(self._wrap_text(text).upper())
-            else:
-                out.append(self._wrap_text(text))
+            if item_cache is None:
+                out.append(self._generate_todo_item_text(item))
+                continue
+            key = (item["type"], item["text"])
+            chunk = item_cache.get(key)
+            if chunk is None:
+                chunk = item_cache[key] = self._generate_todo_item_text(item)
+                misses += 1
+            out.append(chunk)
         out.append("\n")
+        if item_cache is not None:
+            hits = len(items) - misses
+            metrics.inc("checkoff_cache_hits_total", hits, cache="todo_item")
+            metrics.inc("checkoff_cache_misses_total", misses, cache="todo_item")
         return "\n".join(out)
 
-    def get_todo_preview(self, title, items):
-        return self._generate_todo_text(title, items)
+    def get_todo_preview(self, title, items, item_cache=None):
+        with metrics.stage("layout", doc_type="todo"):
+            return self._generate_todo_text(title, items, item_cache=item_cache)
 
     def print_todo(self, title, items):
         """Formats and prints a todo list"""
+        self._ensure_printer()
         # Log the print
-        log_content = self._generate_todo_text(title, items)
+        with metrics.stage("layout", doc_type="todo"):
+            log_content = self._generate_todo_text(title, items)
         self._save_to_log(title, log_content)
 
+        printer = self._printer_label()
+        with metrics.stage("render", doc_type="todo", printer=printer):
+            self._render_todo(title, items)
+        metrics.inc("checkoff_jobs_total", doc_type="todo", printer=printer)
+        return self._flush_to_mqtt()
+
+    def _render_todo(self, title, items):
+        """Renders a todo list as ESC/POS commands on self.printer"""
         if hasattr(self.printer, "hw"):
             self.printer.hw("init")
 
@@ -295,9 +433,12 @@ class PrinterService:
         self.printer.text("\n\n")
         if hasattr(self.printer, "cut"):
             self.printer.cut()
-        self._flush_to_mqtt()
 
     def get_dummy_output(self):
         """Returns the output if in Dummy mode"""
+        if not self._ready.is_set():
+            return None
+        from escpos.printer import Dummy
+
         if isinstance(self.printer, Dummy):
             return self.printer.output
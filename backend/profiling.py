@@ -0,0 +1,141 @@
+"""Opt-in cProfile capture for individual print requests.
+
+A request to a ``@profiled`` endpoint is profiled when it carries an
+``X-Profile: 1`` header, or at random with probability
+``PROFILE_SAMPLE_RATE`` (default 0). The profile is dumped next to the
+job's print log as ``logs/<job>.prof`` (load it with ``pstats`` or
+snakeviz/flameprof for a flamegraph), with a plain-text summary in
+``logs/<job>.profile.txt``. The response carries the job name in an
+``X-Profile-Job`` header, and ``top_functions()`` backs
+``GET /api/debug/profile/<job>``.
+
+Only one request is profiled at a time; concurrent ones run unprofiled.
+"""
+
+import cProfile
+import functools
+import io
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+
+from flask import g, make_response, request
+
+log = logging.getLogger(__name__)
+
+LOG_DIR = "logs"
+PROFILE_HEADER = "X-Profile"
+SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+
+_JOB_RE = re.compile(r"^[\w-]+$")
+_lock = threading.Lock()
+
+
+def _should_profile():
+    if request.headers.get(PROFILE_HEADER, "").lower() in ("1", "true", "yes"):
+        return True
+    return SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+
+
+def _job_name():
+    """Name the profile after the print log written during the request, if any."""
+    log_path = g.get("print_log")
+    if log_path:
+        return os.path.splitext(os.path.basename(log_path))[0]
+    return f"{request.endpoint}-{int(time.time())}-{uuid.uuid4().hex[:6]}"
+
+
+def profile_path(job):
+    if not _JOB_RE.match(job):
+        raise ValueError(f"Invalid profile name '{job}'")
+    return os.path.join(LOG_DIR, f"{job}.prof")
+
+
+def save_profile(profiler, job):
+    """Writes the raw profile and a text summary for a job. Returns the path."""
+    if not os.path.exists(LOG_DIR):
+        os.makedirs(LOG_DIR)
+
+    path = profile_path(job)
+    profiler.dump_stats(path)
+
+    summary = io.StringIO()
+    stats = pstats.Stats(profiler, stream=summary)
+    stats.sort_stats("cumulative").print_stats(40)
+    with open(os.path.join(LOG_DIR, f"{job}.profile.txt"), "w") as f:
+        f.write(f"{request.method} {request.path}\n\n")
+        f.write(summary.getvalue())
+
+    log.info("Saved profile to %s", path)
+    return path
+
+
+def top_functions(job, sort="cumulative", limit=25):
+    """Hottest functions of a saved profile, as JSON-friendly dicts."""
+    path = profile_path(job)
+    if not os.path.exists(path):
+        return None
+
+    stats = pstats.Stats(path)
+    key = {"cumulative": 3, "tottime": 2, "calls": 1}[sort]
+    rows = sorted(stats.stats.items(), key=lambda row: row[1][key], reverse=True)
+
+    functions = []
+    for (filename, line, name), (_, ncalls, tottime, cumtime, _) in rows[:limit]:
+        functions.append(
+            {
+                "function": name,
+                "file": filename,
+                "line": line,
+                "calls": ncalls,
+                "tottime_ms": round(1000 * tottime, 3),
+                "cumtime_ms": round(1000 * cumtime, 3),
+            }
+        )
+    return {
+        "job": job,
+        "total_ms": round(1000 * stats.total_tt, 3),
+        "sort": sort,
+        "functions": functions,
+    }
+
+
+def profiled(view):
+    """Decorator: profile the wrapped Flask view when requested or sampled."""
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not _should_profile() or not _lock.acquire(blocking=False):
+            return view(*args, **kwargs)
+
+        try:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler (e.g. a debugger) is already active
+                return view(*args, **kwargs)
+            try:
+                response = make_response(view(*args, **kwargs))
+            finally:
+                profiler.disable()
+
+            # The job is already queued by now: a profile we can't save must
+            # not turn it into an error the client might retry.
+            try:
+                job = _job_name()
+                save_profile(profiler, job)
+            except Exception:
+                log.exception("Failed to save profile")
+                return response
+            response.headers["X-Profile-Job"] = job
+            return response
+        finally:
+            _lock.release()
+
+    return wrapper
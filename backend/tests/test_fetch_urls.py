@@ -0,0 +1,120 @@
+import sys
+import time
+from pathlib import Path
+
+import pytest
+from bs4 import BeautifulSoup
+
+REPO_DIR = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(REPO_DIR / "tools"))
+
+import fetch_urls  # noqa: E402
+from fetch_urls import SeenSet, SiteRule, TokenBucket, normalize  # noqa: E402
+
+
+def test_normalize():
+    assert normalize("https://www.Example.com/recipe/b/?x=1#y") == (
+        "https://example.com/recipe/b"
+    )
+    assert normalize("https://example.com") == "https://example.com/"
+    assert normalize("https://example.com/recipe/b") == normalize(
+        " https://example.com/recipe/b/ \n"
+    )
+
+
+def test_seen_set_dedupes_and_persists(tmp_path):
+    output = tmp_path / "urls.txt"
+    output.write_text("https://www.example.com/recipe/a/\n")
+    path = tmp_path / "seen" / "seen.txt"
+
+    seen = SeenSet(str(path), also_from=[str(output)])
+    assert not seen.add("https://example.com/recipe/a")  # already in the output
+    assert seen.add("https://example.com/recipe/b")
+    assert not seen.add("https://example.com/recipe/b/#comments")
+    seen.save()
+
+    # URLs pruned from the output by hand stay known through the seen file
+    output.write_text("")
+    seen = SeenSet(str(path), also_from=[str(output)])
+    assert not seen.add("https://example.com/recipe/a")
+    assert not seen.add("https://example.com/recipe/b")
+    assert seen.add("https://example.com/recipe/c")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake monotonic clock; sleeping just advances it."""
+    now = [1000.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    monkeypatch.setattr(fetch_urls.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(fetch_urls.time, "sleep", sleep)
+    return sleeps
+
+
+def test_token_bucket_paces_after_burst(clock):
+    bucket = TokenBucket(rate=2, burst=2)
+    bucket.acquire()
+    bucket.acquire()
+    assert clock == []  # the burst goes straight through
+
+    bucket.acquire()
+    bucket.acquire()
+    assert sum(clock) == pytest.approx(1.0)  # then 2 per second
+
+
+def test_token_bucket_pause(clock):
+    bucket = TokenBucket(rate=1, burst=1)
+    bucket.pause(30)
+    start = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - start == pytest.approx(31)
+
+
+def test_token_bucket_pause_ignores_time_before_it(clock):
+    bucket = TokenBucket(rate=1, burst=1)
+    bucket.acquire()
+    time.sleep(8)  # idle time before the 429 must not count against the pause
+    bucket.pause(30)
+    start = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - start == pytest.approx(31)
+
+
+def test_next_pages_rel_next():
+    rule = SiteRule("example.com", [])
+    html = '<link rel="next" href="/list?p=2"><a href="/list?p=9">9</a>'
+    pages = rule.next_pages(
+        BeautifulSoup(html, "html.parser"), "https://example.com/list"
+    )
+    assert pages == ["https://example.com/list?p=2"]
+
+
+def test_next_pages_wordpress():
+    rule = SiteRule("example.com", [])
+    html = '<a href="/page/1/">1</a><a href="/page/3/">3</a><a href="/page/4/">4</a>'
+    soup = BeautifulSoup(html, "html.parser")
+    assert rule.next_pages(soup, "https://example.com/page/2/") == [
+        "https://example.com/page/3/"
+    ]
+    html = '<a href="https://example.com/page/2/">2</a>'
+    soup = BeautifulSoup(html, "html.parser")
+    assert rule.next_pages(soup, "https://example.com/") == [
+        "https://example.com/page/2/"
+    ]
+
+
+def test_food_network_rule_matches_known_urls():
+    rule = next(r for r in fetch_urls.RULES if r.domain == "foodnetwork.com")
+    urls = [
+        line.strip()
+        for line in open(REPO_DIR / "data" / "test-recipes.txt")
+        if "foodnetwork.com" in line
+    ]
+    assert urls
+    assert [u for u in urls if not rule.is_recipe(u)] == []
+    assert not rule.is_recipe("https://www.foodnetwork.com/recipes/recipes-a-z/a")
@@ -0,0 +1,58 @@
+import pytest
+
+import metrics
+from app import app
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = metrics.Registry()
+    monkeypatch.setattr(metrics, "REGISTRY", registry)
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    return registry
+
+
+def test_counter_and_histogram_render(registry):
+    metrics.inc("checkoff_jobs_total", doc_type="todo", printer="kitchen")
+    metrics.inc("checkoff_jobs_total", 2, doc_type="todo", printer="kitchen")
+    metrics.observe("checkoff_stage_duration_seconds", 0.003, stage="layout")
+    metrics.observe("checkoff_stage_duration_seconds", 20, stage="layout")
+
+    text = metrics.render()
+    assert "# TYPE checkoff_jobs_total counter" in text
+    assert 'checkoff_jobs_total{doc_type="todo",printer="kitchen"} 3' in text
+    assert "# TYPE checkoff_stage_duration_seconds histogram" in text
+    bucket = "checkoff_stage_duration_seconds_bucket"
+    assert f'{bucket}{{stage="layout",le="0.0025"}} 0' in text
+    assert f'{bucket}{{stage="layout",le="0.005"}} 1' in text
+    assert f'{bucket}{{stage="layout",le="+Inf"}} 2' in text
+    assert 'checkoff_stage_duration_seconds_count{stage="layout"} 2' in text
+
+
+def test_stage_timer_records_duration(registry):
+    with metrics.stage("render", doc_type="recipe"):
+        pass
+    assert 'stage="render"' in metrics.render()
+
+
+def test_disabled_is_a_no_op(registry, monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", False)
+    with metrics.stage("render"):
+        metrics.inc("checkoff_jobs_total")
+    assert metrics.render() == "\n"
+
+
+def test_metrics_endpoint(registry, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)  # print logs are written relative to cwd
+    client = app.test_client()
+    res = client.post("/api/print/todo", json={"title": "Prep", "items": "- chop"})
+    assert res.status_code == 200
+
+    res = client.get("/metrics")
+    assert res.status_code == 200
+    assert res.mimetype == "text/plain"
+    text = res.get_data(as_text=True)
+    assert 'checkoff_jobs_total{doc_type="todo",printer="mock"} 1' in text
+    assert 'stage="layout"' in text
+    assert 'stage="log_write"' in text
+    assert 'endpoint="/api/print/todo"' in text
@@ -0,0 +1,178 @@
+import threading
+
+import paho.mqtt.client as mqtt
+import pytest
+
+import mqtt_printer
+from mqtt_printer import MqttPrinter
+from print_scheduler import PrintScheduler
+
+
+class FakeClient:
+    """Stands in for paho's Client: records calls, never touches the network."""
+
+    def __init__(self, *args, **kwargs):
+        self.published = []
+        self.subscriptions = []
+        self.rc = mqtt.MQTT_ERR_SUCCESS
+
+    def username_pw_set(self, user, password):
+        pass
+
+    def connect_async(self, host, port):
+        pass
+
+    def reconnect_delay_set(self, min_delay, max_delay):
+        pass
+
+    def loop_start(self):
+        pass
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+    def subscribe(self, topics):
+        self.subscriptions.extend(topics)
+
+    def publish(self, topic, payload=None, qos=0):
+        self.published.append((topic, payload))
+        result = type("Result", (), {})()
+        result.rc = self.rc
+        return result
+
+
+class Message:
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload.encode()
+
+
+@pytest.fixture
+def printer(monkeypatch):
+    monkeypatch.setattr(mqtt_printer.mqtt, "Client", FakeClient)
+    printer = MqttPrinter("localhost", 1883, "printer", "printer")
+    printer._on_connect(printer._client, None, {}, 0)
+    return printer
+
+
+def deliver(printer, topic, payload):
+    printer._on_message(printer._client, None, Message(topic, payload))
+
+
+def test_subscribes_to_status_and_acks(printer):
+    topics = [topic for topic, qos in printer._client.subscriptions]
+    assert topics == ["printer/+/status", "printer/+/acks"]
+
+
+def test_presence(printer):
+    assert printer.is_online("kitchen")  # unknown printers are assumed up
+
+    deliver(printer, "printer/kitchen/status", "offline")
+    assert not printer.is_online("kitchen")
+
+    deliver(printer, "printer/kitchen/status", '{"state": "online", "paper": "low"}')
+    assert printer.is_online("kitchen")
+    assert printer.status()["kitchen"]["paper"] == "low"
+
+    deliver(printer, "printer/kitchen/status", "")
+    assert printer.status()["kitchen"]["online"] is None
+
+
+def test_acks_match_jobs_in_order(printer):
+    printer.publish("kitchen", b"abc")
+    printer.publish("kitchen", b"defgh")
+    assert printer.status()["kitchen"]["pending_acks"] == 2
+
+    deliver(printer, "printer/kitchen/acks", '{"bytes": 3, "ok": true}')
+    deliver(
+        printer, "printer/kitchen/acks", '{"bytes": 5, "ok": false, "error": "jam"}'
+    )
+
+    status = printer.status()["kitchen"]
+    assert status["pending_acks"] == 0
+    assert status["jobs_acked"] == 1
+    assert status["jobs_failed"] == 1
+    assert status["last_error"] == "jam"
+    assert status["latency_avg_ms"] is not None
+
+
+def test_can_publish_needs_broker_connection(printer):
+    assert printer.can_publish("kitchen")
+    printer._on_disconnect(printer._client, None, 1)
+    assert not printer.can_publish("kitchen")
+
+
+def test_scheduler_holds_jobs_for_offline_printer(printer):
+    sent = threading.Event()
+
+    def publish(name, data):
+        printer.publish(name, data)
+        sent.set()
+
+    deliver(printer, "printer/kitchen/status", "offline")
+    scheduler = PrintScheduler(publish, is_available=printer.can_publish)
+    try:
+        scheduler.submit("kitchen", b"ticket")
+        assert not sent.wait(0.3)
+        assert scheduler.stats()["kitchen"]["held"]
+
+        deliver(printer, "printer/kitchen/status", "online")
+        assert sent.wait(2)
+        assert printer._client.published == [("printer/kitchen/jobs", b"ticket")]
+    finally:
+        scheduler.shutdown(timeout=2)
+
+
+def test_pending_jobs_are_lost_when_printer_restarts(printer):
+    deliver(printer, "printer/kitchen/status", "online")
+    printer.publish("kitchen", b"abc")
+    deliver(printer, "printer/kitchen/status", "offline")
+    deliver(printer, "printer/kitchen/status", "online")
+
+    status = printer.status()["kitchen"]
+    assert status["pending_acks"] == 0
+    assert status["jobs_lost"] == 1
+
+    # The next ack pairs with the next job, not the lost one
+    printer.publish("kitchen", b"hello")
+    deliver(printer, "printer/kitchen/acks", '{"bytes": 5, "ok": true}')
+    assert printer.status()["kitchen"]["jobs_acked"] == 1
+
+
+def test_stale_pending_jobs_expire(printer, monkeypatch):
+    printer.publish("kitchen", b"abc")
+    printer.publish("kitchen", b"hello")
+    with printer._lock:
+        state = printer._states["kitchen"]
+        state.pending[0] = (state.pending[0][0] - 1000, 3)
+
+    deliver(printer, "printer/kitchen/acks", '{"bytes": 5, "ok": true}')
+    status = printer.status()["kitchen"]
+    assert status["jobs_lost"] == 1
+    assert status["jobs_acked"] == 1
+    assert status["pending_acks"] == 0
+
+    monkeypatch.setattr(mqtt_printer, "PENDING_LIMIT", 2)
+    for _ in range(3):
+        printer.publish("kitchen", b"x")
+    assert printer.status()["kitchen"]["pending_acks"] == 2
+    assert printer.status()["kitchen"]["jobs_lost"] == 2
+
+
+def test_publish_while_disconnected_stays_pending(printer):
+    # paho queues QoS 1 messages until it reconnects
+    printer._client.rc = mqtt.MQTT_ERR_NO_CONN
+    assert printer.publish("kitchen", b"abc") is True
+    assert printer.status()["kitchen"]["pending_acks"] == 1
+
+    deliver(printer, "printer/kitchen/acks", '{"bytes": 3, "ok": true}')
+    assert printer.status()["kitchen"]["jobs_acked"] == 1
+
+
+def test_dropped_publish_is_not_pending(printer):
+    printer._client.rc = mqtt.MQTT_ERR_QUEUE_SIZE
+    assert printer.publish("kitchen", b"abc") is False
+    assert printer.status()["kitchen"]["pending_acks"] == 0
@@ -0,0 +1,160 @@
+import pytest
+
+from app import app, preview_sessions, print_service, todo_formatter
+from preview_session import diff_lines
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+def apply_changes(lines, changes):
+    lines = list(lines)
+    for hunk in changes:
+        lines[hunk["start"] : hunk["start"] + hunk["delete"]] = hunk["lines"]
+    return lines
+
+
+def full_todo_preview(title, items_text):
+    items = todo_formatter.parse(items_text)
+    return print_service.get_todo_preview(title, items).split("\n")
+
+
+def test_diff_lines():
+    assert diff_lines(["a", "b", "c"], ["a", "b", "c"]) is None
+    assert diff_lines(["a", "b", "c"], ["a", "x", "y", "c"]) == {
+        "start": 1,
+        "delete": 1,
+        "lines": ["x", "y"],
+    }
+    assert diff_lines(["a"], []) == {"start": 0, "delete": 1, "lines": []}
+
+
+def test_todo_session_returns_only_changed_lines(client):
+    items = "\n".join(f"- item {i}" for i in range(200))
+    res = client.post(
+        "/api/preview/sessions",
+        json={"kind": "todo", "title": "Groceries", "items": items},
+    )
+    assert res.status_code == 200
+    body = res.get_json()
+    lines = body["lines"]
+    assert lines == full_todo_preview("Groceries", items)
+
+    # Type one character into the middle of the list
+    offset = items.index("item 100") + len("item 100")
+    res = client.post(
+        f"/api/preview/sessions/{body['session']}",
+        json={
+            "version": body["version"],
+            "edits": [{"field": "items", "start": offset, "end": offset, "text": "0"}],
+        },
+    )
+    assert res.status_code == 200
+    update = res.get_json()
+    assert len(update["changes"]) == 1
+    assert update["changes"][0]["lines"] == ["[ ] item 1000"]
+
+    new_items = items[:offset] + "0" + items[offset:]
+    assert apply_changes(lines, update["changes"]) == full_todo_preview(
+        "Groceries", new_items
+    )
+
+
+def test_recipe_text_session_field_replace(client):
+    res = client.post(
+        "/api/preview/sessions",
+        json={"kind": "recipe", "mode": "text", "title": "Eggs", "text": "Whisk."},
+    )
+    body = res.get_json()
+
+    res = client.post(
+        f"/api/preview/sessions/{body['session']}",
+        json={"text": "Whisk.\nCook gently."},
+    )
+    update = res.get_json()
+    expected = print_service.get_recipe_preview("Eggs", [], "Whisk.\nCook gently.")
+    assert apply_changes(body["lines"], update["changes"]) == expected.split("\n")
+
+
+def test_session_errors(client):
+    res = client.post("/api/preview/sessions", json={"kind": "poster"})
+    assert res.status_code == 400
+
+    res = client.post("/api/preview/sessions/nope", json={"items": "- a"})
+    assert res.status_code == 404
+
+    body = client.post(
+        "/api/preview/sessions", json={"kind": "todo", "items": "- a"}
+    ).get_json()
+    res = client.post(
+        f"/api/preview/sessions/{body['session']}", json={"version": 99, "items": "x"}
+    )
+    assert res.status_code == 409
+
+    res = client.delete(f"/api/preview/sessions/{body['session']}")
+    assert res.status_code == 200
+    res = client.post(f"/api/preview/sessions/{body['session']}", json={})
+    assert res.status_code == 404
+
+
+def test_failed_edits_leave_session_unchanged(client):
+    body = client.post(
+        "/api/preview/sessions", json={"kind": "todo", "items": "- a"}
+    ).get_json()
+    url = f"/api/preview/sessions/{body['session']}"
+    edits = [
+        {"field": "items", "start": 3, "end": 3, "text": "b"},
+        {"field": "items", "start": 50, "end": 60, "text": "c"},
+    ]
+    res = client.post(url, json={"version": body["version"], "edits": edits})
+    assert res.status_code == 400
+
+    # The first edit was not kept, and the version still matches the client's
+    edits = [{"field": "items", "start": 3, "end": 3, "text": "x"}]
+    res = client.post(url, json={"version": body["version"], "edits": edits})
+    assert res.status_code == 200
+    lines = apply_changes(body["lines"], res.get_json()["changes"])
+    assert lines == full_todo_preview("To Do", "- ax")
+
+
+def test_edit_offsets_are_code_points(client):
+    body = client.post(
+        "/api/preview/sessions", json={"kind": "todo", "items": "- \U0001f345 a"}
+    ).get_json()
+    # After the tomato, as the frontend sends it (code points, not UTF-16 units)
+    edits = [{"field": "items", "start": 5, "end": 5, "text": "b"}]
+    res = client.post(
+        f"/api/preview/sessions/{body['session']}",
+        json={"version": body["version"], "edits": edits},
+    )
+    lines = apply_changes(body["lines"], res.get_json()["changes"])
+    assert lines == full_todo_preview("To Do", "- \U0001f345 ab")
+
+
+@pytest.mark.parametrize(
+    "update",
+    [
+        {"items": ["- a"]},
+        {"title": 5},
+        {"edits": {"field": "items", "start": 0, "text": "x"}},
+        {"edits": ["x"]},
+        {"edits": [{"start": 0, "text": "x"}]},
+        {"edits": [{"field": "url", "start": 0, "text": "x"}]},
+        {"edits": [{"field": "items", "start": 0, "text": 5}]},
+        {"edits": [{"field": "items", "start": "a", "text": "x"}]},
+    ],
+)
+def test_malformed_input_is_rejected(client, update):
+    body = client.post(
+        "/api/preview/sessions", json={"kind": "todo", "items": "- a"}
+    ).get_json()
+    res = client.post(f"/api/preview/sessions/{body['session']}", json=update)
+    assert res.status_code == 400
+
+    # A failed first update doesn't leave a session behind
+    count = len(preview_sessions._sessions)
+    res = client.post("/api/preview/sessions", json={"kind": "todo", **update})
+    assert res.status_code == 400
+    assert len(preview_sessions._sessions) == count
@@ -0,0 +1,107 @@
+import threading
+import time
+
+import pytest
+
+from print_scheduler import PrintJob, PrintScheduler, _PrinterQueue
+
+
+def job(submitter, priority="normal", data=b"x"):
+    return PrintJob("kitchen", data, priority=priority, submitter=submitter)
+
+
+def test_queue_priority_then_round_robin():
+    queue = _PrinterQueue()
+    a1, a2, a3 = job("alice"), job("alice"), job("alice")
+    b1 = job("bob")
+    urgent = job("carol", priority="urgent")
+    low = job("dave", priority="low")
+    for j in (low, a1, a2, a3, b1, urgent):
+        queue.push(j)
+
+    assert queue.depth_by_priority() == {"urgent": 1, "normal": 4, "low": 1}
+    order = [queue.pop() for _ in range(6)]
+    assert order == [urgent, a1, b1, a2, a3, low]
+    assert queue.pop() is None
+    assert queue.depth == 0
+
+
+def test_scheduler_publishes_and_reports_stats():
+    sent = []
+    done = threading.Event()
+
+    def publish(printer, data):
+        sent.append((printer, data))
+        if len(sent) == 3:
+            done.set()
+
+    scheduler = PrintScheduler(publish)
+    try:
+        scheduler.submit("kitchen", b"one", submitter="alice")
+        scheduler.submit("kitchen", b"two", submitter="bob")
+        scheduler.submit("desk", b"three")
+        assert done.wait(2)
+        time.sleep(0.05)
+
+        stats = scheduler.stats()
+        assert stats["kitchen"]["jobs_sent"] == 2
+        assert stats["kitchen"]["bytes_sent"] == 6
+        assert stats["kitchen"]["queue_depth"] == 0
+        assert stats["desk"]["jobs_sent"] == 1
+        assert sorted(sent) == [
+            ("desk", b"three"),
+            ("kitchen", b"one"),
+            ("kitchen", b"two"),
+        ]
+    finally:
+        scheduler.shutdown(timeout=1)
+
+
+def test_scheduler_paces_by_bytes_per_sec():
+    times = []
+    done = threading.Event()
+
+    def publish(printer, data):
+        times.append(time.monotonic())
+        if len(times) == 2:
+            done.set()
+
+    # 100 bytes at 1000 B/s: the second job waits ~0.1s for the first to print
+    scheduler = PrintScheduler(publish, bytes_per_sec=1000)
+    try:
+        scheduler.submit("kitchen", b"x" * 100)
+        scheduler.submit("kitchen", b"y" * 10)
+        assert done.wait(2)
+        assert times[1] - times[0] >= 0.09
+    finally:
+        scheduler.shutdown(timeout=1)
+
+
+def test_scheduler_counts_dropped_publish_as_error():
+    done = threading.Event()
+
+    def publish(printer, data):
+        if data == b"dropped":
+            return False
+        done.set()
+        return True
+
+    scheduler = PrintScheduler(publish)
+    try:
+        scheduler.submit("kitchen", b"dropped")
+        scheduler.submit("kitchen", b"sent")
+        assert done.wait(2)
+        time.sleep(0.05)
+
+        stats = scheduler.stats()
+        assert stats["kitchen"]["errors"] == 1
+        assert stats["kitchen"]["jobs_sent"] == 1
+        assert stats["kitchen"]["bytes_sent"] == 4
+    finally:
+        scheduler.shutdown(timeout=1)
+
+
+def test_scheduler_rejects_unknown_priority():
+    scheduler = PrintScheduler(lambda printer, data: None)
+    with pytest.raises(ValueError):
+        scheduler.submit("kitchen", b"x", priority="asap")
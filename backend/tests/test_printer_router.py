@@ -0,0 +1,134 @@
+import json
+
+import pytest
+
+from printer_router import PrinterRouter, load_config, normalize_config
+
+CONFIG = {
+    "brokers": {
+        "huxley": {"host": "10.0.1.2", "user": "printer", "password": "printer"},
+        "downtown": {"host": "10.0.2.2", "port": 1884},
+    },
+    "printers": [
+        {"id": "kitchen-huxley", "name": "Kitchen", "broker": "huxley"},
+        {"id": "pass-downtown", "broker": "downtown", "bytes_per_sec": 8192},
+    ],
+}
+
+
+class FakeMqttPrinter:
+    def __init__(self, host, port, user, password):
+        self.host = host
+        self.port = port
+        self.connected = True
+        self.connects = 1
+        self.disconnects = 0
+        self.published = []
+        self.offline = set()
+        self.fail = False
+
+    def publish(self, printer_name, data):
+        if self.fail:
+            return False
+        self.published.append((printer_name, data))
+        return True
+
+    def is_online(self, printer_name):
+        return printer_name not in self.offline
+
+    def can_publish(self, printer_name):
+        return self.connected and self.is_online(printer_name)
+
+    def status(self):
+        return {name: {"online": False} for name in self.offline}
+
+    def disconnect(self):
+        self.connected = False
+
+
+@pytest.fixture
+def router():
+    return PrinterRouter(CONFIG, client_factory=FakeMqttPrinter)
+
+
+def test_one_client_per_broker(router):
+    assert set(router._clients) == {"huxley", "downtown"}
+    assert router._clients["downtown"].port == 1884
+    assert router._clients["huxley"].port == 1883
+
+
+def test_publish_routes_by_printer(router):
+    router.publish("kitchen-huxley", b"a")
+    router.publish("pass-downtown", b"bb")
+    assert router._clients["huxley"].published == [("kitchen-huxley", b"a")]
+    assert router._clients["downtown"].published == [("pass-downtown", b"bb")]
+
+    stats = router.broker_stats()
+    assert stats["downtown"]["jobs_published"] == 1
+    assert stats["downtown"]["bytes_published"] == 2
+    assert stats["downtown"]["jobs_last_minute"] == 1
+    assert stats["huxley"]["printers"] == ["kitchen-huxley"]
+
+
+def test_unknown_printer_without_default_broker(router):
+    assert not router.knows("garage")
+    with pytest.raises(ValueError):
+        router.publish("garage", b"x")
+
+
+def test_failed_publish_counts_as_broker_error(router):
+    router._clients["huxley"].fail = True
+    assert router.publish("kitchen-huxley", b"x") is False
+    stats = router.broker_stats()["huxley"]
+    assert stats["errors"] == 1
+    assert stats["jobs_published"] == 0
+
+
+def test_health_is_per_broker(router):
+    router._clients["downtown"].connected = False
+    router._clients["huxley"].offline.add("kitchen-huxley")
+
+    assert router.connected
+    assert not router.can_publish("pass-downtown")
+    assert not router.is_online("kitchen-huxley")
+    assert router.status() == {"kitchen-huxley": {"online": False, "broker": "huxley"}}
+    assert router.broker_stats()["downtown"]["connected"] is False
+
+
+def test_printer_rates(router):
+    assert router.printer_rates() == {"pass-downtown": 8192}
+
+
+def test_config_validation():
+    with pytest.raises(ValueError):
+        normalize_config({"brokers": {"a": {"host": "h"}}, "printers": [{"id": "p"}]})
+    with pytest.raises(ValueError):
+        normalize_config(
+            {
+                "brokers": {"a": {"host": "h"}},
+                "printers": [{"id": "p", "broker": "a"}, {"id": "p", "broker": "a"}],
+            }
+        )
+
+    # The old single-broker dict routes everything to one broker
+    legacy = normalize_config({"host": "h", "port": 1, "user": "u", "password": "p"})
+    assert legacy["default_broker"] == "default"
+
+
+def test_load_config(tmp_path, monkeypatch):
+    path = tmp_path / "printers.json"
+    path.write_text(json.dumps({**CONFIG, "default_broker": "huxley"}))
+    config = load_config(str(path))
+    assert config["printers"][1]["name"] == "pass-downtown"
+
+    router = PrinterRouter(config, client_factory=FakeMqttPrinter)
+    router.publish("garage", b"x")  # falls back to the default broker
+    assert router._clients["huxley"].published == [("garage", b"x")]
+
+    monkeypatch.setenv("MQTT_PRINTERS", "a:A,b:B")
+    env_config = load_config()
+    assert [p["id"] for p in env_config["printers"]] == ["a", "b"]
+    assert env_config["default_broker"] is None
+    env_router = PrinterRouter(env_config, client_factory=FakeMqttPrinter)
+    assert env_router.knows("a")
+    assert not env_router.knows("garage")
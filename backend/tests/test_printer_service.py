@@ -0,0 +1,41 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from printer_service import PrinterService
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+
+def test_background_connect_reports_ready():
+    service = PrinterService(mode="mock")
+    assert service.wait_ready(10)
+    assert service.readiness() == {
+        "ready": True,
+        "printer": True,
+        "broker": None,
+        "error": None,
+    }
+
+
+def test_print_waits_for_background_connect(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    service = PrinterService(mode="mock")
+    service.print_todo("Prep", [{"type": "task", "text": "chop"}])
+    assert b"chop" in service.get_dummy_output()
+
+
+def test_url_mode_dependencies_are_not_imported_at_startup():
+    probe = (
+        "import sys, app; app.print_service.wait_ready(30); "
+        "print(sorted(m for m in ('bs4', 'requests') if m in sys.modules))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", probe],
+        cwd=BACKEND_DIR,
+        env={"PRINTER_MODE": "mock", "PATH": ""},
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    assert out.strip().splitlines()[-1] == "[]"
@@ -0,0 +1,66 @@
+import pytest
+
+import profiling
+from app import app
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)  # logs and profiles are written relative to cwd
+    return app.test_client()
+
+
+def test_unprofiled_by_default(client):
+    res = client.post("/api/print/todo", json={"items": "- chop"})
+    assert res.status_code == 200
+    assert "X-Profile-Job" not in res.headers
+
+
+def test_profile_header_captures_and_serves_profile(client, tmp_path):
+    res = client.post(
+        "/api/print/todo",
+        json={"title": "Prep List", "items": "- chop\n- dice"},
+        headers={"X-Profile": "1"},
+    )
+    assert res.status_code == 200
+    job = res.headers["X-Profile-Job"]
+
+    # Stored alongside the job's print log
+    assert job.startswith("prep-list-")
+    assert (tmp_path / "logs" / f"{job}.txt").exists()
+    assert (tmp_path / "logs" / f"{job}.prof").exists()
+    assert (tmp_path / "logs" / f"{job}.profile.txt").exists()
+
+    res = client.get(f"/api/debug/profile/{job}?sort=tottime&limit=5")
+    assert res.status_code == 200
+    profile = res.get_json()
+    assert profile["job"] == job
+    assert len(profile["functions"]) == 5
+    tottimes = [f["tottime_ms"] for f in profile["functions"]]
+    assert tottimes == sorted(tottimes, reverse=True)
+
+
+def test_sampling_rate(client, monkeypatch):
+    monkeypatch.setattr(profiling, "SAMPLE_RATE", 1.0)
+    res = client.post("/api/print/todo", json={"items": "- chop"})
+    assert "X-Profile-Job" in res.headers
+
+
+def test_profile_endpoint_errors(client):
+    assert client.get("/api/debug/profile/missing").status_code == 404
+    assert client.get("/api/debug/profile/x?sort=bogus").status_code == 400
+    assert client.get("/api/debug/profile/..%2Fsecret").status_code in (400, 404)
+
+
+def test_failed_profile_save_keeps_response(client, monkeypatch, caplog):
+    def fail(profiler, job):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(profiling, "save_profile", fail)
+    res = client.post(
+        "/api/print/todo", json={"items": "- chop"}, headers={"X-Profile": "1"}
+    )
+    assert res.status_code == 200
+    assert res.get_json()["status"] == "success"
+    assert "X-Profile-Job" not in res.headers
+    assert "Failed to save profile" in caplog.text
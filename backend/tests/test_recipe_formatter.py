@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+from formatters import recipe
+from formatters.recipe import RecipeFormatter
+
+
+@pytest.fixture
+def formatter():
+    return RecipeFormatter(cache_ttl=0)
+
+
+def make_recipe(name="Meatloaf", ingredients=True, instructions=True):
+    node = {"@type": "Recipe", "name": name}
+    if ingredients:
+        node["recipeIngredient"] = ["1 lb beef"]
+    if instructions:
+        node["recipeInstructions"] = [{"@type": "HowToStep", "text": "Bake."}]
+    return node
+
+
+def test_finds_recipe_in_graph(formatter):
+    data = {
+        "@context": "https://schema.org",
+        "@graph": [
+            {"@type": "WebPage", "breadcrumb": {"@id": "#crumbs"}},
+            {"@type": "BreadcrumbList", "itemListElement": [{"name": "Home"}] * 50},
+            make_recipe(),
+        ],
+    }
+    assert formatter._find_recipe_data(data)["name"] == "Meatloaf"
+
+
+def test_finds_recipe_with_type_list_and_nested(formatter):
+    data = [{"@type": "WebPage", "mainEntity": {"@type": ["Recipe", "NewsArticle"]}}]
+    assert formatter._find_recipe_data(data) == {"@type": ["Recipe", "NewsArticle"]}
+
+
+def test_finds_recipe_in_item_list(formatter):
+    data = {
+        "@type": "ItemList",
+        "itemListElement": [
+            {"@type": "ListItem", "position": 1, "item": make_recipe("Listed")}
+        ],
+    }
+    assert formatter._find_recipe_data(data)["name"] == "Listed"
+
+
+def test_prefers_most_complete_recipe(formatter):
+    data = {
+        "@graph": [
+            make_recipe("Teaser", ingredients=False, instructions=False),
+            {"@type": "WebPage", "hasPart": make_recipe("Full")},
+        ]
+    }
+    assert formatter._find_recipe_data(data)["name"] == "Full"
+
+
+def test_deep_nesting_does_not_recurse(formatter):
+    data = make_recipe()
+    for _ in range(5000):
+        data = {"child": data}
+    # Old recursive search would hit RecursionError; now it's just out of range
+    assert formatter._find_recipe_data(data) is None
+
+
+def test_node_cap(formatter, monkeypatch):
+    monkeypatch.setattr(recipe, "MAX_JSONLD_NODES", 10)
+    data = {"@graph": [{"@type": "Thing"}] * 20 + [make_recipe()]}
+    assert formatter._find_recipe_data(data) is None
+
+
+def test_script_precheck_skips_blocks_without_recipe(formatter, monkeypatch):
+    parsed = []
+    real_loads = json.loads
+
+    def loads(raw):
+        parsed.append(raw)
+        return real_loads(raw)
+
+    monkeypatch.setattr(recipe.json, "loads", loads)
+    blocks = [
+        json.dumps({"@type": "Organization", "name": "Site"}),
+        None,
+        "{not json Recipe",
+        json.dumps(make_recipe("Partial", instructions=False)),
+        json.dumps(make_recipe("Complete")),
+        json.dumps(make_recipe("Never reached")),
+    ]
+    assert formatter._find_recipe_in_scripts(blocks)["name"] == "Complete"
+    assert len(parsed) == 3
+
+
+def test_too_deep_block_is_skipped(formatter):
+    deep = '{"@type": "Recipe", "child": ' * 5000 + "{}" + "}" * 5000
+    with pytest.raises(RecursionError):
+        json.loads(deep)
+
+    blocks = [deep, json.dumps(make_recipe())]
+    assert formatter._find_recipe_in_scripts(blocks)["name"] == "Meatloaf"
@@ -0,0 +1,57 @@
+import pytest
+
+from formatters.todo import TodoDocument, TodoFormatter
+
+
+@pytest.fixture(scope="module")
+def formatter():
+    return TodoFormatter()
+
+
+@pytest.mark.parametrize(
+    "line, expected",
+    [
+        ("# Produce", {"type": "header", "text": "Produce"}),
+        ("## Dairy", {"type": "header2", "text": "Dairy"}),
+        ("### Snacks", {"type": "header3", "text": "Snacks"}),
+        ("- [ ] Make bed", {"type": "task", "text": "Make bed"}),
+        ("* [x] **Coffee**", {"type": "task", "text": "Coffee"}),
+        ("12.  Preheat oven", {"type": "task", "text": "Preheat oven"}),
+        ("**Bring bags**", {"type": "bold", "text": "Bring bags"}),
+        ("__Bring bags__", {"type": "bold", "text": "Bring bags"}),
+        ("- Milk", {"type": "task", "text": "Milk"}),
+        ("* Butter", {"type": "task", "text": "Butter"}),
+        ("Call **mom** back", {"type": "plain", "text": "Call mom back"}),
+        ("12.Preheat", {"type": "plain", "text": "12.Preheat"}),
+        ("   ", None),
+    ],
+)
+def test_parse_line(formatter, line, expected):
+    assert formatter.parse_line(line) == expected
+
+
+def test_parse_skips_blank_lines(formatter):
+    items = formatter.parse("# Produce\n\n- Bananas\n  \n- Spinach")
+    assert [item["text"] for item in items] == ["Produce", "Bananas", "Spinach"]
+
+
+def test_parse_incremental_reuses_unchanged_lines(formatter):
+    old_text = "# Produce\n- Bananas\n- Spinach\n# Dairy\n- Milk"
+    old_lines = old_text.split("\n")
+    old_items = [formatter.parse_line(line) for line in old_lines]
+
+    new_text = "# Produce\n- Bananas\n- Kale\n- Leeks\n# Dairy\n- Milk"
+    lines, items, changed = formatter.parse_incremental(old_lines, old_items, new_text)
+
+    assert changed == (2, 3, 4)
+    assert items[0] is old_items[0]
+    assert items[-1] is old_items[-1]
+    assert [item for item in items if item] == formatter.parse(new_text)
+
+
+def test_document_update_matches_full_parse(formatter):
+    doc = TodoDocument("- a\n- b\n- c")
+    for text in ["- a\n- b\n- c\n", "- a\n\n- c\n", "## x\n- a\n- c", "", "1. z"]:
+        doc.update(text)
+        assert doc.text == text
+        assert doc.items == formatter.parse(text)
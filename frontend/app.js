@@ -46,18 +46,18 @@ document.addEventListener('DOMContentLoaded', () => {
     setupForm('recipe-url-form', 'api/print/recipe', (formData) => ({
         mode: 'url',
         url: formData.get('url')
-    }));
+    }), { previewKind: 'recipe', livePreview: false });
 
     setupForm('recipe-text-form', 'api/print/recipe', (formData) => ({
         mode: 'text',
         title: formData.get('title'),
         text: formData.get('text')
-    }));
+    }), { previewKind: 'recipe', livePreview: true });
 
     setupForm('todo-form', 'api/print/todo', (formData) => ({
         title: formData.get('title'),
         items: formData.get('items')
-    }));
+    }), { previewKind: 'todo', livePreview: true });
 
     // Modal Close
     document.querySelector('.close-modal').addEventListener('click', closeModal);
@@ -70,18 +70,158 @@ document.addEventListener('DOMContentLoaded', () => {
 
 let currentPreviewFormId = null;
 
-function setupForm(formId, endpoint, dataMapper) {
+// Live preview sessions, keyed by form id: { id, version, lines, fields }
+const previewSessions = {};
+const previewInFlight = {};
+const previewDirty = {};
+
+function setupForm(formId, endpoint, dataMapper, options = {}) {
     const form = document.getElementById(formId);
     if (!form) return;
 
     // Attach dataMapper to form for easy access in preview
     form.dataset.endpoint = endpoint;
+    form.dataset.previewKind = options.previewKind;
     form.dataMapper = dataMapper;
 
     form.addEventListener('submit', async (e) => {
         e.preventDefault();
         submitForm(formId, false);
     });
+
+    // Once a form has been previewed, keep its preview in sync as the user types
+    if (options.livePreview) {
+        form.addEventListener('input', () => {
+            if (previewSessions[formId]) {
+                syncPreview(formId).catch(err => console.error(err));
+            }
+        });
+    }
+}
+
+// Number of code points (what the server indexes by) in a string
+function codePointLength(text) {
+    let n = 0;
+    for (const _ of text) n++;
+    return n;
+}
+
+const isHighSurrogate = code => code >= 0xD800 && code <= 0xDBFF;
+const isLowSurrogate = code => code >= 0xDC00 && code <= 0xDFFF;
+
+// Character splice that turns `oldText` into `newText` (common prefix/suffix trimmed).
+// JS strings index by UTF-16 unit, so the range is widened to whole surrogate
+// pairs and the offsets are sent as code points.
+function textSplice(oldText, newText) {
+    let start = 0;
+    const limit = Math.min(oldText.length, newText.length);
+    while (start < limit && oldText[start] === newText[start]) start++;
+
+    let oldEnd = oldText.length;
+    let newEnd = newText.length;
+    while (oldEnd > start && newEnd > start && oldText[oldEnd - 1] === newText[newEnd - 1]) {
+        oldEnd--;
+        newEnd--;
+    }
+
+    if (start > 0 && isHighSurrogate(oldText.charCodeAt(start - 1))) start--;
+    if (oldEnd < oldText.length && isLowSurrogate(oldText.charCodeAt(oldEnd))) {
+        oldEnd++;
+        newEnd++;
+    }
+
+    const cpStart = codePointLength(oldText.slice(0, start));
+    return {
+        start: cpStart,
+        end: cpStart + codePointLength(oldText.slice(start, oldEnd)),
+        text: newText.slice(start, newEnd)
+    };
+}
+
+async function postJson(url, body) {
+    const res = await fetch(url, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(body)
+    });
+    return { res, result: await res.json() };
+}
+
+async function createPreviewSession(formId, fields) {
+    const form = document.getElementById(formId);
+    const { res, result } = await postJson('api/preview/sessions', {
+        kind: form.dataset.previewKind,
+        ...fields
+    });
+    if (!res.ok) {
+        throw new Error(result.message || result.error || 'Failed to preview.');
+    }
+    previewSessions[formId] = {
+        id: result.session,
+        version: result.version,
+        lines: result.lines,
+        fields: { ...fields }
+    };
+}
+
+// Sends only the changed text to the server and applies the returned line hunks.
+// Requests for a form are serialized; edits made while one is in flight are
+// folded into a single follow-up request.
+async function syncPreview(formId) {
+    if (previewInFlight[formId]) {
+        previewDirty[formId] = true;
+        return previewInFlight[formId];
+    }
+
+    previewInFlight[formId] = (async () => {
+        do {
+            previewDirty[formId] = false;
+            const form = document.getElementById(formId);
+            const fields = form.dataMapper(new FormData(form));
+            const session = previewSessions[formId];
+
+            if (!session) {
+                await createPreviewSession(formId, fields);
+            } else {
+                const body = { version: session.version, edits: [] };
+                for (const [name, value] of Object.entries(fields)) {
+                    const oldValue = session.fields[name] || '';
+                    const newValue = value || '';
+                    if (name === 'mode') {
+                        body.mode = newValue;
+                    } else if (oldValue !== newValue) {
+                        body.edits.push({ field: name, ...textSplice(oldValue, newValue) });
+                    }
+                }
+
+                const { res, result } = await postJson(`api/preview/sessions/${session.id}`, body);
+                if (res.status === 404 || res.status === 409 || res.status === 400) {
+                    // Session expired, out of step or rejected our edits:
+                    // start over with the full form
+                    delete previewSessions[formId];
+                    await createPreviewSession(formId, fields);
+                } else if (!res.ok) {
+                    throw new Error(result.message || result.error || 'Failed to preview.');
+                } else {
+                    result.changes.forEach(hunk => {
+                        session.lines.splice(hunk.start, hunk.delete, ...hunk.lines);
+                    });
+                    session.version = result.version;
+                    session.fields = { ...fields };
+                }
+            }
+
+            if (currentPreviewFormId === formId && isModalOpen()) {
+                setPreviewContent(previewSessions[formId].lines.join('\n'));
+            }
+        } while (previewDirty[formId]);
+    })();
+
+    try {
+        await previewInFlight[formId];
+    } finally {
+        previewInFlight[formId] = null;
+    }
 }
 
 async function handlePreview(formId) {
@@ -98,31 +238,11 @@ async function handlePreview(formId) {
     setLoading(btn, true, 'Generating...');
 
     try {
-        const formData = new FormData(form);
-        const dataMapper = form.dataMapper;
-        const data = dataMapper(formData);
-        if (selectedPrinter) {
-            data.printer = selectedPrinter;
-        }
-        data.preview = true; // Flag for preview
-
-        const res = await fetch(form.dataset.endpoint, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(data)
-        });
-
-        const result = await res.json();
-
-        if (res.ok && result.preview) {
-            showModal(result.preview);
-        } else {
-            showStatus('error', result.message || 'Failed to preview.');
-        }
-
+        await syncPreview(formId);
+        showModal(previewSessions[formId].lines.join('\n'));
     } catch (err) {
         console.error(err);
-        showStatus('error', 'Network error during preview.');
+        showStatus('error', err.message || 'Network error during preview.');
     } finally {
         setLoading(btn, false, 'Preview');
     }
@@ -174,8 +294,16 @@ async function submitForm(formId) {
     }
 }
 
-function showModal(content) {
+function setPreviewContent(content) {
     document.getElementById('preview-content').innerText = content;
+}
+
+function isModalOpen() {
+    return document.getElementById('preview-modal').classList.contains('active');
+}
+
+function showModal(content) {
+    setPreviewContent(content);
     document.getElementById('preview-modal').classList.add('active');
 }
 
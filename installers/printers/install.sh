@@ -42,21 +42,65 @@ BROKER_PASS="$BROKER_PASS"
 PRINTER_NAME="$PRINTER_NAME"
 PRINTER_DEV="/dev/usb/lp0"
 TOPIC="printer/\$PRINTER_NAME/jobs"
+STATUS_TOPIC="printer/\$PRINTER_NAME/status"
+ACKS_TOPIC="printer/\$PRINTER_NAME/acks"
+JOB_FILE="/tmp/print-job.bin"
+
+pub() {
+    mosquitto_pub -h "\$BROKER_HOST" -p "\$BROKER_PORT" \\
+        -u "\$BROKER_USER" -P "\$BROKER_PASS" -q 1 "\$@"
+}
 
 logger -t print-agent "Starting print agent for \$PRINTER_NAME"
 logger -t print-agent "Subscribing to \$TOPIC on \$BROKER_HOST:\$BROKER_PORT"
 
+# Presence: a long-lived connection whose last will marks us offline.
+# Each time it (re)connects we mark ourselves online again.
 while true; do
+    (sleep 2; pub -r -t "\$STATUS_TOPIC" -m online) &
     mosquitto_sub \\
         -h "\$BROKER_HOST" \\
         -p "\$BROKER_PORT" \\
         -u "\$BROKER_USER" \\
         -P "\$BROKER_PASS" \\
+        -i "print-agent-\$PRINTER_NAME-presence" \\
+        -t "printer/\$PRINTER_NAME/presence" \\
+        --will-topic "\$STATUS_TOPIC" \\
+        --will-payload offline \\
+        --will-retain \\
+        --will-qos 1 \\
+        > /dev/null 2>&1
+    sleep 5
+done &
+
+# Jobs: take one message at a time on a persistent session (queued jobs
+# survive between messages), write it to the printer, then ack it.
+while true; do
+    if ! mosquitto_sub \\
+        -h "\$BROKER_HOST" \\
+        -p "\$BROKER_PORT" \\
+        -u "\$BROKER_USER" \\
+        -P "\$BROKER_PASS" \\
+        -i "print-agent-\$PRINTER_NAME" \\
+        -c -q 1 \\
         -t "\$TOPIC" \\
+        -C 1 \\
         -N \\
-        > "\$PRINTER_DEV" 2>/dev/null
-    logger -t print-agent "Connection lost, reconnecting in 5s..."
-    sleep 5
+        > "\$JOB_FILE" 2>/dev/null; then
+        logger -t print-agent "Connection lost, reconnecting in 5s..."
+        sleep 5
+        continue
+    fi
+
+    SIZE=\$(wc -c < "\$JOB_FILE")
+    if cat "\$JOB_FILE" > "\$PRINTER_DEV" 2>/dev/null; then
+        pub -t "\$ACKS_TOPIC" -m "{\\"bytes\\": \$SIZE, \\"ok\\": true}"
+        pub -r -t "\$STATUS_TOPIC" -m online
+    else
+        logger -t print-agent "Failed to write job to \$PRINTER_DEV"
+        pub -t "\$ACKS_TOPIC" -m "{\\"bytes\\": \$SIZE, \\"ok\\": false, \\"error\\": \\"write failed\\"}"
+        pub -r -t "\$STATUS_TOPIC" -m "{\\"state\\": \\"online\\", \\"error\\": \\"write failed\\"}"
+    fi
 done
 EOF
 
@@ -0,0 +1,194 @@
+"""Benchmarks the JSON-LD Recipe search against the old recursive version.
+
+The corpus is a directory of saved recipe pages (*.html). Save one with
+--save-corpus (fetches the URLs in data/test-recipes.txt). Without a corpus,
+pages are synthesized from data/recipes.json with the kind of payloads that
+made the old search slow: big @graph arrays of breadcrumbs, reviews and
+author bios, with the Recipe node last.
+
+Usage (from the repo root):
+    python tools/bench_jsonld.py
+    python tools/bench_jsonld.py --save-corpus data/html-corpus
+    python tools/bench_jsonld.py --corpus data/html-corpus --repeat 20
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from formatters.recipe import RecipeFormatter  # noqa: E402
+
+
+def legacy_find_recipe_data(data):
+    """The original recursive search, kept here as the baseline."""
+    if isinstance(data, dict):
+        type_val = data.get("@type", "")
+        if isinstance(type_val, list):
+            if any("Recipe" in t for t in type_val):
+                return data
+        elif isinstance(type_val, str) and "Recipe" in type_val:
+            return data
+        if "@graph" in data:
+            return legacy_find_recipe_data(data["@graph"])
+        for value in data.values():
+            res = legacy_find_recipe_data(value)
+            if res:
+                return res
+    elif isinstance(data, list):
+        for item in data:
+            res = legacy_find_recipe_data(item)
+            if res:
+                return res
+    return None
+
+
+def legacy_find_in_scripts(blocks):
+    for raw in blocks:
+        try:
+            found = legacy_find_recipe_data(json.loads(raw))
+            if found:
+                return found
+        except Exception:
+            continue
+    return None
+
+
+def synthetic_pages(recipes_file="data/recipes.json", reviews=300, crumbs=200):
+    """ld+json blocks per page, padded the way big recipe sites pad them."""
+    with open(recipes_file) as f:
+        recipes = json.load(f)
+
+    pages = []
+    for r in recipes:
+        noise = [
+            {"@type": "Organization", "name": "Site", "logo": {"url": "x"}},
+            {
+                "@type": "BreadcrumbList",
+                "itemListElement": [
+                    {"@type": "ListItem", "position": i, "item": {"name": f"c{i}"}}
+                    for i in range(crumbs)
+                ],
+            },
+            {
+                "@type": "Person",
+                "name": "Author",
+                "description": "bio " * 200,
+                "sameAs": [f"https://social.example/{i}" for i in range(50)],
+            },
+            {
+                "@type": "WebPage",
+                "review": [
+                    {
+                        "@type": "Review",
+                        "author": {"@type": "Person", "name": f"r{i}"},
+                        "reviewRating": {"ratingValue": 5},
+                        "reviewBody": "Great! " * 20,
+                    }
+                    for i in range(reviews)
+                ],
+            },
+        ]
+        recipe = {
+            "@type": "Recipe",
+            "name": r["title"],
+            "recipeIngredient": r["ingredients"],
+            "recipeInstructions": [
+                {"@type": "HowToStep", "text": step}
+                for step in r["instructions"].split("\n")
+            ],
+        }
+        pages.append(
+            [
+                json.dumps({"@type": "WebSite", "name": "Site"}),
+                json.dumps(
+                    {"@context": "https://schema.org", "@graph": noise + [recipe]}
+                ),
+            ]
+        )
+    return pages
+
+
+def corpus_pages(corpus_dir):
+    from bs4 import BeautifulSoup
+
+    pages = []
+    for name in sorted(os.listdir(corpus_dir)):
+        if not name.endswith(".html"):
+            continue
+        with open(os.path.join(corpus_dir, name), encoding="utf-8") as f:
+            soup = BeautifulSoup(f.read(), "html.parser")
+        scripts = soup.find_all("script", type="application/ld+json")
+        pages.append([s.string for s in scripts if s.string])
+    return pages
+
+
+def save_corpus(corpus_dir, urls_file="data/test-recipes.txt"):
+    import re
+
+    import requests
+
+    os.makedirs(corpus_dir, exist_ok=True)
+    with open(urls_file) as f:
+        urls = [line.strip() for line in f if line.strip()]
+    for url in urls:
+        slug = re.sub(r"[^\w-]+", "-", url.split("://", 1)[-1]).strip("-")[:120]
+        try:
+            response = requests.get(
+                url, headers={"User-Agent": "Mozilla/5.0"}, timeout=15
+            )
+            response.raise_for_status()
+        except Exception as e:
+            print(f"Failed to fetch {url}: {e}")
+            continue
+        with open(os.path.join(corpus_dir, f"{slug}.html"), "w", encoding="utf-8") as f:
+            f.write(response.text)
+        print(f"Saved {url}")
+
+
+def bench(name, fn, pages, repeat):
+    found = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        found = 0
+        for blocks in pages:
+            try:
+                if fn(blocks):
+                    found += 1
+            except RecursionError:
+                pass
+    elapsed = time.perf_counter() - start
+    per_page_ms = 1000 * elapsed / (repeat * max(len(pages), 1))
+    print(f"{name:>10}: {per_page_ms:8.3f} ms/page  recipes found {found}/{len(pages)}")
+    return per_page_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", help="directory of saved *.html recipe pages")
+    parser.add_argument("--save-corpus", help="fetch test URLs into this directory")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.save_corpus:
+        save_corpus(args.save_corpus)
+        return
+
+    if args.corpus:
+        pages = corpus_pages(args.corpus)
+        print(f"Corpus: {len(pages)} saved pages from {args.corpus}")
+    else:
+        pages = synthetic_pages()
+        print(f"Corpus: {len(pages)} synthetic pages from data/recipes.json")
+
+    formatter = RecipeFormatter(cache_ttl=0)
+    old = bench("recursive", legacy_find_in_scripts, pages, args.repeat)
+    new = bench("iterative", formatter._find_recipe_in_scripts, pages, args.repeat)
+    print(f"   speedup: {old / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
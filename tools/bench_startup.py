@@ -0,0 +1,112 @@
+"""Measures backend cold start: how long `import app` takes and how long until
+the printer service reports ready.
+
+Each run is a fresh interpreter, so module caches don't hide import costs.
+
+Usage (from the repo root):
+    python tools/bench_startup.py                    # mock mode, 10 runs
+    python tools/bench_startup.py --mode mqtt --runs 5
+    python tools/bench_startup.py --backend-dir /tmp/old-checkout/backend
+    python tools/bench_startup.py --importtime       # slowest imports too
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = """
+import json, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+service = app.print_service
+if hasattr(service, "wait_ready"):
+    service.wait_ready(60)
+t2 = time.perf_counter()
+print(json.dumps({"import_ms": (t1 - t0) * 1000, "ready_ms": (t2 - t0) * 1000}))
+"""
+
+
+def run_once(backend_dir, env):
+    proc = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=backend_dir,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(backend_dir, env, limit=15):
+    """Top-level modules by cumulative import time, from python -X importtime."""
+    script = "import app; getattr(app.print_service, 'wait_ready', bool)(60)"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        cwd=backend_dir,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|", 2)
+        if name.strip() == "site":
+            # Everything so far was interpreter startup, not ours
+            rows = []
+            continue
+        # Keep modules imported directly by our code (one level of nesting);
+        # deeper ones are already counted in their parent's cumulative time.
+        if len(name) - len(name.lstrip()) > 3:
+            continue
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend-dir", default="backend")
+    parser.add_argument("--mode", default="mock", choices=["mock", "mqtt", "usb"])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--importtime", action="store_true")
+    args = parser.parse_args()
+
+    env = dict(os.environ, PRINTER_MODE=args.mode)
+    if args.mode == "mqtt":
+        # Nothing listens here: measures startup with the broker down
+        env.setdefault("MQTT_BROKER_HOST", "127.0.0.1")
+        env.setdefault("MQTT_BROKER_PORT", "1")
+
+    results = []
+    for i in range(args.runs):
+        try:
+            results.append(run_once(args.backend_dir, env))
+        except Exception as e:
+            print(f"Run {i + 1} failed: {e}")
+            return 1
+
+    for key in ("import_ms", "ready_ms"):
+        values = [r[key] for r in results]
+        print(
+            f"{key:>10}: median {statistics.median(values):7.1f}  "
+            f"min {min(values):7.1f}  max {max(values):7.1f}"
+        )
+
+    if args.importtime:
+        print("\nSlowest imports (cumulative ms / self ms):")
+        for cumulative_us, self_us, name in slowest_imports(args.backend_dir, env):
+            print(f"  {cumulative_us / 1000:8.1f} {self_us / 1000:8.1f}  {name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,94 +1,348 @@
-import requests
-from bs4 import BeautifulSoup
-import sys
+"""Crawls recipe sites for recipe URLs and appends new ones to
+data/test-recipes.txt.
+
+Each site is described by a SiteRule: where to start, which links are
+recipes, and how to find the next page of a listing. Listing pages are
+followed for up to --depth pages per site. Sites are crawled concurrently,
+but requests to any one domain go through a token bucket (--rate requests
+per second, bursts of --burst) so no site sees more than that.
+
+Every recipe URL ever written is remembered in a seen-set file
+(data/crawl-seen.txt), alongside the URLs already in the output file, so
+re-runs only add new URLs, and URLs removed from the output by hand are not
+added back.
+
+Site rules are pluggable: --rules my_rules.py loads a module whose RULES
+list is used in addition to (or, with the same domain, instead of) the
+built-in ones.
+
+Usage (from the repo root):
+    python tools/fetch_urls.py
+    python tools/fetch_urls.py --depth 20 --rate 2 --sites pinchofyum.com
+    python tools/fetch_urls.py --rules tools/my_rules.py --dry-run
+"""
+
+import argparse
+import importlib.util
+import os
 import re
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+import requests
+from bs4 import BeautifulSoup
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+)
+
+_PAGE_RE = re.compile(r"/page/(\d+)/?$")
+
+
+def domain_of(url):
+    host = urlsplit(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def normalize(url):
+    """Dedupe key for a URL: no query, fragment, www. or trailing slash."""
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), domain_of(url), path, "", ""))
+
+
+class SiteRule:
+    """How to crawl one site. Subclass (or pass patterns) to customize."""
+
+    def __init__(self, domain, start_urls, recipe_pattern=None, skip_pattern=None):
+        self.domain = domain
+        self.start_urls = start_urls
+        self.recipe_re = re.compile(recipe_pattern or r"/recipes?/")
+        self.skip_re = re.compile(skip_pattern or r"/(gallery|collection|category)/")
+
+    def is_recipe(self, url):
+        return bool(self.recipe_re.search(url)) and not self.skip_re.search(url)
+
+    def next_pages(self, soup, url):
+        """Listing pages to follow from this one (pagination)."""
+        pages = []
+        for tag in soup.find_all(["a", "link"], rel=True, href=True):
+            if "next" in tag["rel"]:
+                pages.append(urljoin(url, tag["href"]))
+        if not pages:
+            # WordPress-style /page/N/ listings without rel="next"
+            match = _PAGE_RE.search(urlsplit(url).path)
+            current = int(match.group(1)) if match else 1
+            for a in soup.find_all("a", href=True):
+                found = _PAGE_RE.search(urlsplit(a["href"]).path)
+                if found and int(found.group(1)) == current + 1:
+                    pages.append(urljoin(url, a["href"]))
+                    break
+        return pages
+
+    def recipe_links(self, soup, url):
+        links = []
+        for a in soup.find_all("a", href=True):
+            href = urljoin(url, a["href"])
+            if domain_of(href) == self.domain and self.is_recipe(href):
+                links.append(href)
+        return links
+
+
+class PinchOfYumRule(SiteRule):
+    """Recipes live at https://pinchofyum.com/<slug>; /recipes/... are
+    category pages."""
+
+    SKIP = ("/recipes/", "/category/", "/about", "/contact", "/start-here", "/page/")
+
+    def is_recipe(self, url):
+        path = urlsplit(url).path.strip("/")
+        if not path or "/" in path or any(s in f"/{path}/" for s in self.SKIP):
+            return False
+        # Must look like a slug
+        return len(path) > 5 or "-" in path
+
 
+RULES = [
+    SiteRule(
+        "allrecipes.com",
+        ["https://www.allrecipes.com/recipes/17562/dinner/"],
+        recipe_pattern=r"allrecipes\.com/recipe/",
+    ),
+    # The home page lists the latest recipes, paginated as /page/N/
+    PinchOfYumRule("pinchofyum.com", ["https://pinchofyum.com/"]),
+    SiteRule(
+        "damndelicious.net",
+        ["https://damndelicious.net/"],
+        recipe_pattern=r"damndelicious\.net/\d{4}/\d{2}/\d{2}/",
+    ),
+    SiteRule(
+        "twopeasandtheirpod.com",
+        ["https://www.twopeasandtheirpod.com/"],
+        recipe_pattern=r"twopeasandtheirpod\.com/[\w-]{6,}/?$",
+        skip_pattern=r"/(recipes|category|page|about|contact|shop)(/|$)",
+    ),
+    SiteRule(
+        "foodnetwork.com",
+        ["https://www.foodnetwork.com/recipes/recipes-a-z/a"],
+        # /recipes/<slug>-<id>, optionally under a chef: /recipes/<chef>/<slug>-<id>
+        recipe_pattern=r"foodnetwork\.com/recipes/(?:[\w-]+/)?[\w-]+-\d+/?$",
+    ),
+]
 
-def fetch_links(url, filter_pattern, limit=50):
-    print(f"Fetching {url}...")
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
-    try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-    except Exception as e:
-        print(f"Failed to fetch {url}: {e}")
-        return []
-
-    soup = BeautifulSoup(response.text, "html.parser")
-    links = set()
-
-    # Get all links
-    for a in soup.find_all("a", href=True):
-        href = a["href"]
-
-        # Resolve relative
-        if href.startswith("/"):
-            # Just rough base domain handling
-            parts = url.split("/")
-            base = f"{parts[0]}//{parts[2]}"
-            href = base + href
-
-        # Special handling for Pinch of Yum
-        if "pinchofyum.com" in url:
-            # We want https://pinchofyum.com/slug
-            # We do NOT want https://pinchofyum.com/recipes/slug (categories)
-            if "pinchofyum.com" in href:
-                if "/recipes/" in href:
-                    continue
-                if "/about" in href or "/contact" in href or "/start-here" in href:
-                    continue
-                # Must have a slug (heuristic: length > 30 or dashes)
-                if len(href.split("/")[-1]) > 5 or "-" in href.split("/")[-1]:
-                    links.add(href)
-            continue
-
-        # Filter for others
-        if filter_pattern and filter_pattern not in href:
-            continue
-
-        # Heuristics for "actual recipe page"
-        # Most have /recipe/ or /recipes/ in the path, and likely end with a slug
-        if "/recipe/" in href or "/recipes/" in href:
-            # Avoid listicle pages if possible (often contain /gallery/ or /collection/)
-            if "/gallery/" in href or "/collection/" in href or "/category/" in href:
+
+def load_rules(path):
+    """RULES from a user module, e.g. tools/my_rules.py."""
+    spec = importlib.util.spec_from_file_location("crawl_rules", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return list(module.RULES)
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average, in bursts of `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+    def pause(self, seconds):
+        """Back off after a 429: no tokens until `seconds` from now."""
+        with self.lock:
+            self.tokens = -seconds * self.rate
+            self.updated = time.monotonic()
+
+
+class SeenSet:
+    """Recipe URLs already known, persisted one per line."""
+
+    def __init__(self, path, also_from=()):
+        self.path = path
+        self.keys = set()
+        for filename in (path, *also_from):
+            if os.path.exists(filename):
+                with open(filename) as f:
+                    self.keys.update(normalize(line) for line in f if line.strip())
+        self.lock = threading.Lock()
+
+    def add(self, url):
+        """True if the URL is new (and records it)."""
+        key = normalize(url)
+        with self.lock:
+            if key in self.keys:
+                return False
+            self.keys.add(key)
+            return True
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self.lock, open(self.path, "w") as f:
+            f.writelines(key + "\n" for key in sorted(self.keys))
+
+
+class Crawler:
+    def __init__(self, rules, rate=1.0, burst=2, depth=5, workers=8, limit=None):
+        self.rules = {rule.domain: rule for rule in rules}
+        self.buckets = {domain: TokenBucket(rate, burst) for domain in self.rules}
+        self.depth = depth
+        self.workers = workers
+        self.limit = limit
+        self.local = threading.local()
+
+    def _session(self):
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = self.local.session = requests.Session()
+            session.headers["User-Agent"] = USER_AGENT
+        return session
+
+    def fetch(self, url, retries=2):
+        bucket = self.buckets[domain_of(url)]
+        for _ in range(retries + 1):
+            bucket.acquire()
+            try:
+                response = self._session().get(url, timeout=10)
+            except requests.RequestException as e:
+                print(f"Failed to fetch {url}: {e}")
+                return None
+            if response.status_code == 429:
+                retry_after = response.headers.get("Retry-After", "")
+                bucket.pause(int(retry_after) if retry_after.isdigit() else 30)
                 continue
-            links.add(href)
+            if response.ok:
+                return response.text
+            print(f"Failed to fetch {url}: HTTP {response.status_code}")
+            return None
+        print(f"Giving up on {url}: rate limited")
+        return None
+
+    def crawl_page(self, rule, url):
+        """Fetches one listing page. Returns (recipe links, next pages)."""
+        html = self.fetch(url)
+        if html is None:
+            return [], []
+        soup = BeautifulSoup(html, "html.parser")
+        return rule.recipe_links(soup, url), rule.next_pages(soup, url)
+
+    def run(self, seen, on_new):
+        """Crawls every rule's start URLs, calling on_new(url) for each recipe
+        URL not in `seen`. Returns {domain: new URL count}."""
+        found = dict.fromkeys(self.rules, 0)
+        visited = set()
+        with ThreadPoolExecutor(self.workers) as pool:
+            pending = {}
+
+            def schedule(rule, url, depth):
+                key = url.split("#", 1)[0]  # query strings can be the page number
+                if key in visited or depth > self.depth:
+                    return
+                if self.limit and found[rule.domain] >= self.limit:
+                    return
+                visited.add(key)
+                pending[pool.submit(self.crawl_page, rule, url)] = (rule, url, depth)
+
+            for rule in self.rules.values():
+                for url in rule.start_urls:
+                    schedule(rule, url, 1)
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    rule, url, depth = pending.pop(future)
+                    try:
+                        links, next_pages = future.result()
+                    except Exception as e:
+                        print(f"Error crawling {url}: {e}")
+                        continue
+
+                    new = 0
+                    for link in links:
+                        if self.limit and found[rule.domain] >= self.limit:
+                            break
+                        if seen.add(link):
+                            on_new(link)
+                            found[rule.domain] += 1
+                            new += 1
+                    print(f"[{rule.domain}] page {depth}: {new} new of {len(links)}")
+
+                    for page in next_pages:
+                        if domain_of(page) == rule.domain:
+                            schedule(rule, page, depth + 1)
+        return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default="data/test-recipes.txt")
+    parser.add_argument("--seen", default="data/crawl-seen.txt")
+    parser.add_argument("--depth", type=int, default=5, help="listing pages per site")
+    parser.add_argument("--rate", type=float, default=1.0, help="requests/s per domain")
+    parser.add_argument("--burst", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--limit", type=int, help="max new URLs per site")
+    parser.add_argument("--rules", help="python file with extra RULES")
+    parser.add_argument("--sites", nargs="*", help="only crawl these domains")
+    parser.add_argument("--dry-run", action="store_true", help="print, don't write")
+    args = parser.parse_args()
+
+    rules = {rule.domain: rule for rule in RULES}
+    if args.rules:
+        rules.update((rule.domain, rule) for rule in load_rules(args.rules))
+    if args.sites:
+        rules = {d: r for d, r in rules.items() if d in args.sites}
+
+    seen = SeenSet(args.seen, also_from=[args.output])
+    crawler = Crawler(
+        rules.values(),
+        rate=args.rate,
+        burst=args.burst,
+        depth=args.depth,
+        workers=args.workers,
+        limit=args.limit,
+    )
+
+    start = time.monotonic()
+    if args.dry_run:
+        found = crawler.run(seen, print)
+    else:
+        # Written as found, so an interrupted crawl keeps what it got
+        with open(args.output, "a") as out:
 
-    print(f"Found {len(links)} matching links on {url}")
-    return list(links)[:limit]
+            def write(url):
+                out.write(url + "\n")
+                out.flush()
 
+            try:
+                found = crawler.run(seen, write)
+            finally:
+                seen.save()
 
-def append_to_file(filename, links):
-    if not links:
-        return
-    with open(filename, "a") as f:
-        for link in links:
-            f.write(link + "\n")
-    print(f"Appended {len(links)} links to {filename}")
+    for domain, count in found.items():
+        print(f"{domain}: {count} new URLs")
+    print(f"{sum(found.values())} new URLs in {time.monotonic() - start:.1f}s")
 
 
 if __name__ == "__main__":
-    sources = [
-        # Allrecipes (very standard structure)
-        {
-            "url": "https://www.allrecipes.com/recipes/17562/dinner/",
-            "filter": "allrecipes.com/recipe/",
-        },
-        # Pinch of Yum (Home page has latest recipes)
-        {"url": "https://pinchofyum.com/", "filter": "pinchofyum.com/"},
-        # Damn Delicious (Home)
-        {"url": "https://damndelicious.net/", "filter": "damndelicious.net/"},
-        # Two Peas and Their Pod
-        {
-            "url": "https://www.twopeasandtheirpod.com/",
-            "filter": "twopeasandtheirpod.com/",
-        },
-    ]
-
-    for source in sources:
-        links = fetch_links(source["url"], source["filter"])
-        append_to_file("data/test-recipes.txt", links)
-        time.sleep(1)  # Be nice
+    main()
@@ -0,0 +1,606 @@
+"""Load test: how many print jobs per second the backend and broker sustain.
+
+Starts, all on this machine:
+
+- a minimal in-process MQTT broker (enough of MQTT 3.1.1 for paho:
+  QoS 0/1, retained messages, wildcards, last wills);
+- simulated printers, one MQTT client each, that announce themselves
+  online, "print" each job at --write-speed bytes/s and ack it on
+  printer/<id>/acks like the router agent does;
+- the backend in mqtt mode, in a subprocess pointed at the broker.
+
+It then sends a mix of recipe prints, todo prints and live preview editing
+sessions (built from data/recipes.json) at --rate requests per second for
+--duration seconds. Requests are sent on schedule whether or not earlier
+ones have finished, and latency is measured from the scheduled time, so a
+backend that falls behind shows up as latency instead of a lower send rate.
+
+Every print job carries a token in its title, so a printer can tell which
+request a job came from. End-to-end latency runs from the scheduled send to
+the printer's ack. Jobs the backend accepted that no printer finished
+within --drain seconds of the end of the run count as dropped.
+
+Usage (from the repo root):
+    python tools/load_test.py
+    python tools/load_test.py --rate 20 --duration 60 --printers 8
+    python tools/load_test.py --mix recipe=1,todo=1,preview=0 --write-speed 2048
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import socket
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import paho.mqtt.client as mqtt
+import requests
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+SERVER = """
+import os
+from werkzeug.serving import make_server
+import app
+server = make_server("127.0.0.1", int(os.environ["PORT"]), app.app, threaded=True)
+server.serve_forever()
+"""
+
+_TOKEN_RE = re.compile(rb"LT(\d{6})")
+
+
+# -- broker ------------------------------------------------------------------
+
+CONNECT, CONNACK, PUBLISH, PUBACK = 1, 2, 3, 4
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK = 8, 9, 10, 11
+PINGREQ, PINGRESP, DISCONNECT = 12, 13, 14
+
+
+def _mqtt_str(data):
+    return struct.pack("!H", len(data)) + data
+
+
+def _packet(kind, flags, body):
+    header = bytes([(kind << 4) | flags])
+    length = len(body)
+    while True:
+        byte, length = length % 128, length // 128
+        header += bytes([byte | (0x80 if length else 0)])
+        if not length:
+            return header + body
+
+
+def topic_matches(pattern, topic):
+    pattern_parts = pattern.split("/")
+    topic_parts = topic.split("/")
+    for i, part in enumerate(pattern_parts):
+        if part == "#":
+            return True
+        if i >= len(topic_parts) or (part != "+" and part != topic_parts[i]):
+            return False
+    return len(pattern_parts) == len(topic_parts)
+
+
+class _Session:
+    def __init__(self, broker, sock):
+        self.broker = broker
+        self.sock = sock
+        self.subscriptions = {}  # topic filter -> qos
+        self.will = None
+        self.write_lock = threading.Lock()
+        self.next_id = 0
+
+    def send(self, data):
+        with self.write_lock:
+            self.sock.sendall(data)
+
+    def deliver(self, topic, payload, qos, retain=False):
+        body = _mqtt_str(topic.encode())
+        if qos:
+            with self.write_lock:
+                self.next_id = self.next_id % 65535 + 1
+                packet_id = self.next_id
+            body += struct.pack("!H", packet_id)
+        try:
+            self.send(_packet(PUBLISH, (qos << 1) | int(retain), body + payload))
+        except OSError:
+            pass
+
+    def read(self, n):
+        data = b""
+        while len(data) < n:
+            chunk = self.sock.recv(n - len(data))
+            if not chunk:
+                raise ConnectionError("closed")
+            data += chunk
+        return data
+
+    def run(self):
+        clean = False
+        try:
+            while True:
+                first = self.read(1)[0]
+                length, shift = 0, 0
+                while True:
+                    byte = self.read(1)[0]
+                    length |= (byte & 0x7F) << shift
+                    shift += 7
+                    if not byte & 0x80:
+                        break
+                body = self.read(length) if length else b""
+                kind, flags = first >> 4, first & 0x0F
+                if kind == DISCONNECT:
+                    clean = True
+                    return
+                self.handle(kind, flags, body)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.broker.drop(self)
+            if not clean and self.will:
+                self.broker.publish(*self.will)
+            self.sock.close()
+
+    def handle(self, kind, flags, body):
+        if kind == CONNECT:
+            name_len = struct.unpack("!H", body[:2])[0]
+            connect_flags = body[2 + name_len + 1]
+            pos = 2 + name_len + 4
+            fields = []
+            while pos < len(body):
+                size = struct.unpack("!H", body[pos : pos + 2])[0]
+                fields.append(body[pos + 2 : pos + 2 + size])
+                pos += 2 + size
+            if connect_flags & 0x04:  # client id, will topic, will message, ...
+                will_qos = (connect_flags >> 3) & 0x03
+                will_retain = bool(connect_flags & 0x20)
+                self.will = (fields[1].decode(), fields[2], will_qos, will_retain)
+            self.send(_packet(CONNACK, 0, b"\x00\x00"))
+        elif kind == PUBLISH:
+            qos = (flags >> 1) & 0x03
+            size = struct.unpack("!H", body[:2])[0]
+            topic = body[2 : 2 + size].decode()
+            pos = 2 + size
+            if qos:
+                packet_id = body[pos : pos + 2]
+                pos += 2
+            self.broker.publish(topic, body[pos:], qos, bool(flags & 0x01))
+            if qos:
+                self.send(_packet(PUBACK, 0, packet_id))
+        elif kind == SUBSCRIBE:
+            packet_id, pos, granted, new = body[:2], 2, b"", []
+            while pos < len(body):
+                size = struct.unpack("!H", body[pos : pos + 2])[0]
+                pattern = body[pos + 2 : pos + 2 + size].decode()
+                qos = min(body[pos + 2 + size], 1)
+                pos += 3 + size
+                granted += bytes([qos])
+                new.append((pattern, qos))
+            with self.broker.lock:
+                self.subscriptions.update(new)
+            self.send(_packet(SUBACK, 0, packet_id + granted))
+            for pattern, qos in new:
+                for topic, payload, retained_qos in self.broker.retained_for(pattern):
+                    self.deliver(topic, payload, min(qos, retained_qos), retain=True)
+        elif kind == UNSUBSCRIBE:
+            pos = 2
+            with self.broker.lock:
+                while pos < len(body):
+                    size = struct.unpack("!H", body[pos : pos + 2])[0]
+                    self.subscriptions.pop(
+                        body[pos + 2 : pos + 2 + size].decode(), None
+                    )
+                    pos += 2 + size
+            self.send(_packet(UNSUBACK, 0, body[:2]))
+        elif kind == PINGREQ:
+            self.send(_packet(PINGRESP, 0, b""))
+        # PUBACKs for our deliveries need no action
+
+
+class MiniBroker:
+    """Just enough of an MQTT 3.1.1 broker for the backend and test printers."""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.lock = threading.Lock()
+        self.sessions = []
+        self.retained = {}
+        self.messages = 0
+        self.bytes = 0
+        self.server = socket.create_server((host, port))
+        self.port = self.server.getsockname()[1]
+        threading.Thread(target=self._accept, name="broker", daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                sock, _ = self.server.accept()
+            except OSError:
+                return
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            session = _Session(self, sock)
+            with self.lock:
+                self.sessions.append(session)
+            threading.Thread(target=session.run, daemon=True).start()
+
+    def drop(self, session):
+        with self.lock:
+            if session in self.sessions:
+                self.sessions.remove(session)
+
+    def retained_for(self, pattern):
+        with self.lock:
+            return [
+                (topic, payload, qos)
+                for topic, (payload, qos) in self.retained.items()
+                if topic_matches(pattern, topic)
+            ]
+
+    def publish(self, topic, payload, qos, retain=False):
+        targets = []
+        with self.lock:
+            self.messages += 1
+            self.bytes += len(payload)
+            if retain:
+                if payload:
+                    self.retained[topic] = (payload, qos)
+                else:
+                    self.retained.pop(topic, None)
+            for session in self.sessions:
+                granted = [
+                    sub_qos
+                    for pattern, sub_qos in session.subscriptions.items()
+                    if topic_matches(pattern, topic)
+                ]
+                if granted:
+                    targets.append((session, min(qos, max(granted))))
+        for session, out_qos in targets:
+            session.deliver(topic, payload, out_qos)
+
+    def close(self):
+        self.server.close()
+
+
+# -- simulated printers ------------------------------------------------------
+
+
+class SimulatedPrinter:
+    """A router + printer: takes jobs off MQTT, 'prints' them, acks them."""
+
+    def __init__(self, printer_id, port, write_speed, on_printed):
+        self.id = printer_id
+        self.write_speed = write_speed
+        self.on_printed = on_printed
+        self.jobs = deque()
+        self.ready = threading.Condition()
+
+        self.client = mqtt.Client()
+        self.client.will_set(f"printer/{printer_id}/status", "offline", 1, True)
+        self.client.on_connect = self._on_connect
+        self.client.on_message = self._on_message
+        self.client.connect("127.0.0.1", port)
+        self.client.loop_start()
+        threading.Thread(target=self._print_loop, daemon=True).start()
+
+    def _on_connect(self, client, userdata, flags, rc):
+        client.subscribe(f"printer/{self.id}/jobs", qos=1)
+        client.publish(f"printer/{self.id}/status", "online", qos=1, retain=True)
+
+    def _on_message(self, client, userdata, msg):
+        with self.ready:
+            self.jobs.append((time.monotonic(), msg.payload))
+            self.ready.notify()
+
+    def _print_loop(self):
+        while True:
+            with self.ready:
+                while not self.jobs:
+                    self.ready.wait()
+                received_at, data = self.jobs.popleft()
+            if self.write_speed:
+                time.sleep(len(data) / self.write_speed)
+            ack = json.dumps({"bytes": len(data), "ok": True})
+            self.client.publish(f"printer/{self.id}/acks", ack, qos=1)
+            match = _TOKEN_RE.search(data)
+            self.on_printed(
+                int(match.group(1)) if match else None, self.id, received_at
+            )
+
+    def stop(self):
+        self.client.loop_stop()
+        self.client.disconnect()
+
+
+# -- traffic -----------------------------------------------------------------
+
+
+class LoadTest:
+    def __init__(self, base_url, printers, recipes, mix, concurrency):
+        self.base_url = base_url
+        self.printers = printers
+        self.recipes = recipes
+        self.kinds = list(mix)
+        self.weights = [mix[k] for k in self.kinds]
+        self.pool = ThreadPoolExecutor(concurrency)
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+        self.latencies = defaultdict(list)  # kind -> seconds, per HTTP request
+        self.errors = Counter()
+        self.accepted = {}  # token -> scheduled time
+        self.printed = {}  # token -> (printed time, printer)
+        self.unmatched = 0
+
+    def _session(self):
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = self.local.session = requests.Session()
+        return session
+
+    def _post(self, path, payload):
+        response = self._session().post(self.base_url + path, json=payload, timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+    def on_printed(self, token, printer, received_at):
+        with self.lock:
+            if token is None or token not in self.accepted:
+                self.unmatched += 1
+            else:
+                self.printed[token] = (time.monotonic(), printer)
+
+    def _print_job(self, kind, token, scheduled):
+        recipe = random.choice(self.recipes)
+        title = f"LT{token:06d} {recipe['title']}"
+        payload = {
+            "printer": random.choice(self.printers),
+            "submitter": f"user{token % 10}",
+        }
+        if kind == "recipe":
+            payload.update(
+                mode="text",
+                title=title,
+                text="\n".join(recipe["ingredients"]) + "\n\n" + recipe["instructions"],
+            )
+        else:
+            payload.update(
+                title=title,
+                items="\n".join(f"- [ ] {i}" for i in recipe["ingredients"]),
+            )
+        with self.lock:
+            # Before sending: the printer may finish before we get the reply
+            self.accepted[token] = scheduled
+        result = self._post(f"/api/print/{kind}", payload)
+        if "job" not in result:
+            with self.lock:
+                del self.accepted[token]
+            raise RuntimeError(result.get("message", "no job queued"))
+
+    def _preview(self, edits=3):
+        recipe = random.choice(self.recipes)
+        items = "\n".join(f"- [ ] {i}" for i in recipe["ingredients"])
+        session = self._post(
+            "/api/preview/sessions",
+            {"kind": "todo", "title": recipe["title"], "items": items},
+        )
+        version = session["version"]
+        for i in range(edits):
+            text = f"\n- [ ] extra item {i}"
+            update = self._post(
+                f"/api/preview/sessions/{session['session']}",
+                {
+                    "version": version,
+                    "edits": [
+                        {
+                            "field": "items",
+                            "start": len(items),
+                            "end": len(items),
+                            "text": text,
+                        }
+                    ],
+                },
+            )
+            items += text
+            version = update["version"]
+        self._session().delete(
+            f"{self.base_url}/api/preview/sessions/{session['session']}", timeout=30
+        )
+
+    def _run_one(self, kind, token, scheduled):
+        try:
+            if kind == "preview":
+                self._preview()
+            else:
+                self._print_job(kind, token, scheduled)
+        except Exception as e:
+            with self.lock:
+                self.errors[f"{kind}: {type(e).__name__}"] += 1
+                self.accepted.pop(token, None)
+            return
+        with self.lock:
+            self.latencies[kind].append(time.monotonic() - scheduled)
+
+    def drive(self, rate, duration):
+        start = time.monotonic()
+        total = int(rate * duration)
+        for token in range(total):
+            scheduled = start + token / rate
+            delay = scheduled - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            kind = random.choices(self.kinds, self.weights)[0]
+            self.pool.submit(self._run_one, kind, token, scheduled)
+        self.pool.shutdown(wait=True)
+        return time.monotonic() - start
+
+    def wait_printed(self, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self.lock:
+                if len(self.printed) >= len(self.accepted):
+                    return
+            time.sleep(0.1)
+
+
+def percentiles(values):
+    if not values:
+        return "-"
+    values = sorted(values)
+
+    def pick(q):
+        return 1000 * values[min(len(values) - 1, int(q * len(values)))]
+
+    return (
+        f"p50 {pick(0.5):7.1f}  p95 {pick(0.95):7.1f}  p99 {pick(0.99):7.1f}  "
+        f"max {1000 * values[-1]:7.1f} ms"
+    )
+
+
+def start_backend(broker_port, http_port, printers, workdir, pacing):
+    env = dict(
+        os.environ,
+        PRINTER_MODE="mqtt",
+        PORT=str(http_port),
+        MQTT_BROKER_HOST="127.0.0.1",
+        MQTT_BROKER_PORT=str(broker_port),
+        MQTT_PRINTERS=",".join(f"{p}:{p}" for p in printers),
+        PYTHONPATH=os.path.abspath(BACKEND_DIR),
+    )
+    env.pop("MQTT_CONFIG_FILE", None)
+    if pacing is not None:
+        env["PRINTER_BYTES_PER_SEC"] = str(pacing)
+    # Run from a scratch dir so print logs don't pile up in backend/logs
+    return subprocess.Popen(
+        [sys.executable, "-c", SERVER],
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def wait_ready(base_url, backend, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if backend.poll() is not None:
+            raise RuntimeError("Backend exited during startup")
+        try:
+            if requests.get(base_url + "/api/ready", timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Backend did not become ready")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=float, default=10, help="requests/s")
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--printers", type=int, default=4)
+    parser.add_argument(
+        "--write-speed", type=int, default=8192, help="printer bytes/s (0 = instant)"
+    )
+    parser.add_argument(
+        "--mix", default="recipe=2,todo=2,preview=1", help="kind=weight,..."
+    )
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--drain", type=float, default=30, help="seconds to wait")
+    parser.add_argument(
+        "--backend-pacing", type=int, help="PRINTER_BYTES_PER_SEC for the backend"
+    )
+    parser.add_argument("--recipes", default="data/recipes.json")
+    args = parser.parse_args()
+
+    mix = {}
+    for entry in args.mix.split(","):
+        kind, _, weight = entry.partition("=")
+        if kind not in ("recipe", "todo", "preview"):
+            parser.error(f"unknown traffic kind '{kind}'")
+        mix[kind] = float(weight or 1)
+    with open(args.recipes) as f:
+        recipes = [r for r in json.load(f) if r.get("ingredients")]
+
+    broker = MiniBroker()
+    printer_ids = [f"load-{i}" for i in range(args.printers)]
+    http_port = free_port()
+    base_url = f"http://127.0.0.1:{http_port}"
+
+    with tempfile.TemporaryDirectory() as workdir:
+        backend = start_backend(
+            broker.port, http_port, printer_ids, workdir, args.backend_pacing
+        )
+        test = LoadTest(base_url, printer_ids, recipes, mix, args.concurrency)
+        printers = []
+        try:
+            for printer_id in printer_ids:
+                printers.append(
+                    SimulatedPrinter(
+                        printer_id, broker.port, args.write_speed, test.on_printed
+                    )
+                )
+            wait_ready(base_url, backend)
+
+            print(
+                f"Sending {args.rate:g} req/s for {args.duration:g}s to {base_url} "
+                f"({args.printers} printers at {args.write_speed} B/s)"
+            )
+            elapsed = test.drive(args.rate, args.duration)
+            test.wait_printed(args.drain)
+            queue = requests.get(base_url + "/api/queue", timeout=5).json()
+        finally:
+            backend.terminate()
+            backend.wait(10)
+            for printer in printers:
+                printer.stop()
+            broker.close()
+
+    with test.lock:
+        accepted = dict(test.accepted)
+        printed = dict(test.printed)
+    dropped = [t for t in accepted if t not in printed]
+    e2e = [printed[t][0] - accepted[t] for t in printed if t in accepted]
+    last_print = max((p[0] for p in printed.values()), default=0)
+    first_send = min(accepted.values(), default=0)
+
+    print(f"\nRequests (HTTP latency, {elapsed:.1f}s of sending):")
+    for kind in mix:
+        values = test.latencies[kind]
+        print(f"  {kind:>8}: {len(values):6d} ok  {percentiles(values)}")
+    for error, count in sorted(test.errors.items()):
+        print(f"  error {error}: {count}")
+
+    print("\nPrint jobs:")
+    print(f"  accepted {len(accepted)}  printed {len(printed)}  dropped {len(dropped)}")
+    if printed:
+        span = last_print - first_send
+        print(f"  throughput {len(printed) / span:.2f} jobs/s printed")
+        print(f"  end-to-end {percentiles(e2e)}")
+    by_printer = Counter(p for _, p in printed.values())
+    print("  per printer: " + ", ".join(f"{p} {by_printer[p]}" for p in printer_ids))
+    if test.unmatched:
+        print(f"  {test.unmatched} printed jobs matched no request")
+
+    print(f"\nBroker: {broker.messages} messages, {broker.bytes / 1024:.0f} KiB")
+    waits = [s["wait_avg_ms"] for s in queue.get("printers", {}).values()]
+    if waits:
+        print(f"Backend queue wait avg {statistics.mean(waits):.1f} ms")
+    return 1 if dropped else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())